@@ -0,0 +1,181 @@
+import asyncio
+import os
+import re
+import threading
+import time
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from app.compression import ENCODING_ALIASES
+
+# Límites de ingesta concurrente (el global no debería superar pool_size + max_overflow del engine)
+UPLOAD_MAX_CONCURRENCY = int(os.getenv("UPLOAD_MAX_CONCURRENCY", "4"))
+UPLOAD_MAX_PER_TABLE = int(os.getenv("UPLOAD_MAX_PER_TABLE", "2"))
+UPLOAD_QUEUE_SIZE = int(os.getenv("UPLOAD_QUEUE_SIZE", "8"))
+UPLOAD_QUEUE_TIMEOUT = float(os.getenv("UPLOAD_QUEUE_TIMEOUT_SECONDS", "10"))
+
+# Presupuesto de memoria: Content-Length x factor estima el pico del DataFrame
+UPLOAD_MEMORY_BUDGET = int(float(os.getenv("UPLOAD_MEMORY_BUDGET_MB", "512")) * 2**20)
+UPLOAD_MEMORY_FACTOR = float(os.getenv("UPLOAD_MEMORY_FACTOR", "10"))
+UPLOAD_DEFAULT_SIZE = int(float(os.getenv("UPLOAD_DEFAULT_SIZE_MB", "16")) * 2**20)
+# Un CSV en gzip/zstd ocupa ~1/8-1/10 del texto: el estimado se multiplica por esta razón
+UPLOAD_COMPRESSION_RATIO = float(os.getenv("UPLOAD_COMPRESSION_RATIO", "10"))
+
+RETRY_AFTER_SECONDS = int(os.getenv("UPLOAD_RETRY_AFTER_SECONDS", "5"))
+
+# /upload/{table}, /upload-csv/{table}, /upload-csv-com/{table}, ...
+UPLOAD_PATH = re.compile(r"^/upload(?:-[a-z-]+)?/(?P<table>[^/]+)$")
+
+
+class AdmissionController:
+    """
+    Control de admisión para las cargas de CSV.
+
+    Una carga entra si hay cupo global, cupo para su tabla y memoria estimada
+    disponible. Si no, espera en una cola acotada; con la cola llena se rechaza
+    al instante con 429 y si la espera supera el timeout con 503, ambos con
+    Retry-After.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = UPLOAD_MAX_CONCURRENCY,
+        max_per_table: int = UPLOAD_MAX_PER_TABLE,
+        queue_size: int = UPLOAD_QUEUE_SIZE,
+        queue_timeout: float = UPLOAD_QUEUE_TIMEOUT,
+        memory_budget: int = UPLOAD_MEMORY_BUDGET,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_per_table = max_per_table
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.memory_budget = memory_budget
+        self._cond = threading.Condition()
+        self._active = 0
+        self._per_table = {}
+        self._memory = 0
+        self._waiting = 0
+
+    def _fits(self, table_name: str, memory: int) -> bool:
+        return (
+            self._active < self.max_concurrency
+            and self._per_table.get(table_name, 0) < self.max_per_table
+            and self._memory + memory <= self.memory_budget
+        )
+
+    def acquire(self, table_name: str, memory: int):
+        if memory > self.memory_budget:
+            raise HTTPException(status_code=413, detail="Upload exceeds the ingest memory budget.")
+
+        with self._cond:
+            if not self._fits(table_name, memory):
+                if self._waiting >= self.queue_size:
+                    raise _rejected(429, "Too many uploads in progress, retry later.")
+
+                self._waiting += 1
+                try:
+                    deadline = time.monotonic() + self.queue_timeout
+                    while not self._fits(table_name, memory):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise _rejected(503, "Timed out waiting for an ingest slot, retry later.")
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+            self._active += 1
+            self._per_table[table_name] = self._per_table.get(table_name, 0) + 1
+            self._memory += memory
+
+    def release(self, table_name: str, memory: int):
+        with self._cond:
+            self._active -= 1
+            self._per_table[table_name] -= 1
+            if not self._per_table[table_name]:
+                del self._per_table[table_name]
+            self._memory -= memory
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "active": self._active,
+                "waiting": self._waiting,
+                "per_table": dict(self._per_table),
+                "memory_reserved_mb": round(self._memory / 2**20, 1),
+                "memory_budget_mb": round(self.memory_budget / 2**20, 1),
+            }
+
+
+def _rejected(status_code: int, detail: str) -> HTTPException:
+    return HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+
+def estimate_upload_memory(headers: dict) -> int:
+    """
+    Memoria estimada de una carga a partir de las cabeceras del request.
+
+    Usa Content-Length (o un default si no viene) y, si el request declara
+    Content-Encoding gzip/zstd, lo escala por UPLOAD_COMPRESSION_RATIO porque
+    el DataFrame sale del texto descomprimido. Los magic bytes del archivo se
+    revisan recién en la ingesta: aquí el cuerpo todavía no se leyó.
+    """
+    try:
+        size = int(headers[b"content-length"])
+    except (KeyError, ValueError):
+        size = UPLOAD_DEFAULT_SIZE
+    encoding = headers.get(b"content-encoding", b"").decode("latin-1").split(";")[0].strip().lower()
+    if encoding in ENCODING_ALIASES:
+        size *= UPLOAD_COMPRESSION_RATIO
+    return int(size * UPLOAD_MEMORY_FACTOR)
+
+
+upload_admission = AdmissionController()
+
+
+class UploadAdmissionMiddleware:
+    """
+    Middleware ASGI: reserva un cupo de ingesta antes de leer el cuerpo de la carga.
+
+    Como dependency llegaba tarde: FastAPI parsea el multipart (y lo vuelca a
+    disco) antes de resolver dependencies. Aquí se decide solo con las
+    cabeceras y el cupo se libera cuando termina la respuesta, después de
+    cerrar la sesión de get_db. Las tablas que no están en `tables` pasan sin
+    admisión y el endpoint responde su error de siempre.
+    """
+
+    def __init__(self, app, tables=(), controller: AdmissionController = None):
+        self.app = app
+        self.tables = tables
+        self.controller = controller or upload_admission
+
+    async def __call__(self, scope, receive, send):
+        match = UPLOAD_PATH.match(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if match is None or match["table"] not in self.tables:
+            return await self.app(scope, receive, send)
+
+        table_name = match["table"]
+        memory = estimate_upload_memory(dict(scope["headers"]))
+        try:
+            await self._acquire(table_name, memory)
+        except HTTPException as exc:
+            response = JSONResponse({"detail": exc.detail}, status_code=exc.status_code, headers=exc.headers)
+            return await response(scope, receive, send)
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(table_name, memory)
+
+    async def _acquire(self, table_name: str, memory: int):
+        # acquire puede esperar en la cola: va a un thread para no bloquear el event loop
+        acquiring = asyncio.ensure_future(asyncio.to_thread(self.controller.acquire, table_name, memory))
+        try:
+            await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # El cliente se fue mientras esperaba: si el thread igual consigue el cupo, se devuelve
+            acquiring.add_done_callback(
+                lambda done: done.exception() is None and self.controller.release(table_name, memory)
+            )
+            raise
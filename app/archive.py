@@ -0,0 +1,237 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import (
+    Column, DateTime, Integer, MetaData, String, Table, and_, delete, extract, func, literal, literal_column,
+    select, union_all, update,
+)
+from sqlalchemy.orm import Session
+
+from app import models
+from app.versioning import current_data_version, bump_data_version
+
+HIRED_COLUMNS = ["id", "name", "datetime", "department_id", "job_id"]
+
+# Las tablas de archivo viven fuera de Base.metadata: se crean al archivar
+# cada año y no llevan FKs (los datos ya fueron validados al ingresar)
+archive_metadata = MetaData()
+_archive_tables = {}
+_tables_lock = threading.Lock()
+
+
+def quarter_of(column):
+    """
+    Trimestre a partir del mes (SQLite no soporta extract("quarter")).
+
+    Las constantes van como literales: SQL Server rechaza un GROUP BY por una
+    expresión con parámetros.
+    """
+    return (extract("month", column) + literal_column("2", Integer)) // literal_column("3", Integer)
+
+
+def archive_table(year: int) -> Table:
+    """Tabla hired_employees_<año> con las mismas columnas que hired_employees."""
+    with _tables_lock:
+        table = _archive_tables.get(year)
+        if table is None:
+            table = _archive_tables[year] = Table(
+                f"hired_employees_{year}",
+                archive_metadata,
+                Column("id", Integer, primary_key=True),
+                Column("name", String(100)),
+                Column("datetime", DateTime(timezone=True), index=True),
+                Column("department_id", Integer),
+                Column("job_id", Integer),
+            )
+        return table
+
+
+def hired_source(years=(), include_live: bool = True):
+    """
+    Origen de filas de hired_employees limitado a las particiones pedidas.
+
+    Parámetros:
+    - years: Años archivados a incluir
+    - include_live: Si se incluye la tabla viva (años no archivados)
+
+    Retorna:
+    - La tabla directamente si es una sola partición, si no un UNION ALL como subquery
+    """
+    tables = ([models.HiredEmployee.__table__] if include_live else []) + [archive_table(y) for y in sorted(years)]
+    if not tables:
+        tables = [models.HiredEmployee.__table__]
+    if len(tables) == 1:
+        return tables[0]
+    return union_all(*[select(*[t.c[c] for c in HIRED_COLUMNS]) for t in tables]).subquery("hired_employees_all")
+
+
+def year_window(year: int):
+    return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+
+
+def _naive(value: datetime):
+    # Los datetime de hired_employees se guardan sin zona (UTC)
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class PartitionCatalog:
+    """
+    Cache de los años archivados ({año: filas}).
+
+    Se recarga cuando cambia data_version (archivar la incrementa), así que
+    todos los workers ven un año archivado apenas se confirma.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._years = {}
+
+    def archived(self, db: Session, fresh: bool = False) -> dict:
+        """
+        Años archivados de la base.
+
+        Con fresh se lee siempre la tabla y no se guarda en el cache: es la
+        lectura que usan las escrituras después de bump_data_version, cuya
+        transacción todavía no está confirmada.
+        """
+        if fresh:
+            return self._load(db)
+        version, _ = current_data_version(db)
+        with self._lock:
+            if self._version == version:
+                return self._years
+        years = self._load(db)
+        with self._lock:
+            self._version, self._years = version, years
+        return years
+
+    @staticmethod
+    def _load(db: Session) -> dict:
+        rows = db.execute(select(models.ArchivedPartition.year, models.ArchivedPartition.row_count)).all()
+        return {r.year: r.row_count for r in rows}
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+
+    def prune(self, db: Session, windows):
+        """
+        Particiones a leer para una lista de rangos [inicio, fin) (None = abierto).
+
+        Un año archivado entra si se solapa con algún rango; la tabla viva
+        (años no archivados) entra si algún rango cubre un año no archivado.
+
+        Retorna:
+        - (años archivados a incluir, incluir la tabla viva)
+        """
+        archived = self.archived(db)
+        years, include_live = set(), False
+        for start, end in windows:
+            start, end = _naive(start), _naive(end)
+            for year in archived:
+                year_start, year_end = year_window(year)
+                if (start is None or start < year_end) and (end is None or end > year_start):
+                    years.add(year)
+            if start is None or end is None:
+                include_live = True
+            else:
+                covered = range(start.year, (end - timedelta(microseconds=1)).year + 1)
+                include_live = include_live or any(y not in archived for y in covered)
+        return tuple(sorted(years)), include_live
+
+partition_catalog = PartitionCatalog()
+
+
+def refresh_summary(db: Session, year: int) -> int:
+    """Recalcula el resumen (año, trimestre, departamento, puesto) de un año archivado."""
+    table = archive_table(year)
+    quarter = quarter_of(table.c.datetime)
+    db.execute(delete(models.HiredEmployeeSummary).where(models.HiredEmployeeSummary.year == year))
+    summary = select(
+        literal(year, Integer), quarter, table.c.department_id, table.c.job_id, func.count(table.c.id)
+    ).group_by(quarter, table.c.department_id, table.c.job_id)
+    result = db.execute(models.HiredEmployeeSummary.__table__.insert().from_select(
+        ["year", "quarter", "department_id", "job_id", "hired"], summary
+    ))
+    return result.rowcount
+
+
+def archive_year(db: Session, year: int) -> dict:
+    """
+    Mueve las filas de un año cerrado de hired_employees a hired_employees_<año>.
+
+    Todo ocurre en una transacción: copia, borrado en la tabla viva, resumen,
+    catálogo y data_version. Volver a archivar un año ya archivado mueve las
+    filas que hayan quedado en la tabla viva.
+
+    data_version se incrementa primero: su lock de fila serializa el archivo
+    con las escrituras en hired_employees, que lo toman antes de insertar.
+    """
+    if year >= datetime.now(timezone.utc).year:
+        raise HTTPException(status_code=400, detail="Only closed years can be archived.")
+
+    bump_data_version(db)
+    live = models.HiredEmployee.__table__
+    table = archive_table(year)
+    in_year = and_(live.c.datetime >= datetime(year, 1, 1), live.c.datetime < datetime(year + 1, 1, 1))
+
+    table.create(bind=db.connection(), checkfirst=True)
+    db.execute(table.insert().from_select(HIRED_COLUMNS, select(*[live.c[c] for c in HIRED_COLUMNS]).where(in_year)))
+    moved = db.execute(live.delete().where(in_year)).rowcount
+    summary_rows = refresh_summary(db, year)
+    row_count = db.execute(select(func.count()).select_from(table)).scalar()
+
+    entry = db.get(models.ArchivedPartition, year)
+    if entry is None:
+        entry = models.ArchivedPartition(year=year, table_name=table.name)
+        db.add(entry)
+    entry.row_count = row_count
+    entry.archived_at = datetime.now(timezone.utc)
+
+    db.commit()
+    partition_catalog.invalidate()
+
+    return {
+        "year": year,
+        "table": table.name,
+        "rows_moved": moved,
+        "rows_archived": row_count,
+        "summary_rows": summary_rows,
+    }
+
+
+def insert_archived(db: Session, year: int, records: list):
+    """Inserta filas tardías de un año ya archivado en su tabla y actualiza catálogo y resumen."""
+    db.execute(archive_table(year).insert(), records)
+    db.execute(
+        update(models.ArchivedPartition)
+        .where(models.ArchivedPartition.year == year)
+        .values(row_count=models.ArchivedPartition.row_count + len(records))
+    )
+    refresh_summary(db, year)
+
+
+def next_hired_id(db: Session, archived) -> int:
+    """Siguiente id libre de hired_employees contando sus particiones archivadas."""
+    source = hired_source(archived)
+    return (db.execute(select(func.max(source.c.id))).scalar() or 0) + 1
+
+
+def year_summary(db: Session, year: int) -> list:
+    rows = db.execute(
+        select(
+            models.HiredEmployeeSummary.quarter,
+            models.HiredEmployeeSummary.department_id,
+            models.HiredEmployeeSummary.job_id,
+            models.HiredEmployeeSummary.hired,
+        ).where(models.HiredEmployeeSummary.year == year).order_by(
+            models.HiredEmployeeSummary.quarter,
+            models.HiredEmployeeSummary.department_id,
+            models.HiredEmployeeSummary.job_id,
+        )
+    ).all()
+    return [dict(r._mapping) for r in rows]
@@ -0,0 +1,75 @@
+import gzip
+import io
+
+from fastapi import HTTPException, UploadFile
+
+try:
+    import zstandard
+except ImportError:  # zstd es opcional: sin el paquete solo se acepta gzip
+    zstandard = None
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# Content-Encoding / Content-Type que se aceptan como equivalentes
+ENCODING_ALIASES = {
+    "gzip": "gzip",
+    "x-gzip": "gzip",
+    "application/gzip": "gzip",
+    "application/x-gzip": "gzip",
+    "zstd": "zstd",
+    "application/zstd": "zstd",
+}
+
+
+def detect_encoding(file: UploadFile) -> str:
+    """
+    Detecta la compresión de un archivo subido.
+
+    Primero se revisan las cabeceras de la parte multipart (Content-Encoding y
+    Content-Type) y, si no indican nada, los magic bytes del inicio del archivo.
+
+    Retorna:
+    - "gzip", "zstd" o "identity"
+    """
+    headers = file.headers or {}
+    for value in (headers.get("content-encoding"), file.content_type):
+        encoding = ENCODING_ALIASES.get((value or "").split(";")[0].strip().lower())
+        if encoding:
+            return encoding
+
+    head = file.file.read(4)
+    file.file.seek(0)
+    if head.startswith(GZIP_MAGIC):
+        return "gzip"
+    if head.startswith(ZSTD_MAGIC):
+        return "zstd"
+    return "identity"
+
+
+def open_csv_stream(file: UploadFile, encoding: str = "utf-8") -> io.TextIOWrapper:
+    """
+    Abre un archivo subido como stream de texto, descomprimiendo al vuelo si viene en gzip o zstd.
+
+    La descompresión es incremental: pandas va leyendo bloques del stream y el
+    texto descomprimido completo nunca se materializa en memoria.
+
+    Parámetros:
+    - file: UploadFile recibido por el endpoint
+    - encoding: Codificación del texto (default utf-8)
+
+    Retorna:
+    - Stream de texto listo para pd.read_csv
+    """
+    compression = detect_encoding(file)
+
+    if compression == "gzip":
+        raw = gzip.GzipFile(fileobj=file.file, mode="rb")
+    elif compression == "zstd":
+        if zstandard is None:
+            raise HTTPException(status_code=415, detail="zstd uploads require the 'zstandard' package.")
+        raw = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(file.file))
+    else:
+        raw = file.file
+
+    return io.TextIOWrapper(raw, encoding=encoding)
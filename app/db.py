@@ -1,5 +1,10 @@
 from sqlalchemy import create_engine
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import sessionmaker, declarative_base
+from contextlib import contextmanager
+import itertools
+import threading
+import time
 import os
 
 DB_SERVER = os.getenv("DB_SERVER")
@@ -8,13 +13,88 @@ DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 
 # URL estilo SQLAlchemy para SQL Server con pyodbc
-DATABASE_URL = (
+# (DATABASE_URL permite apuntar a otra base, p. ej. sqlite:///primary.db en local)
+DATABASE_URL = os.getenv("DATABASE_URL") or (
     f"mssql+pyodbc://{DB_USER}:{DB_PASSWORD}@{DB_SERVER}:1433/{DB_NAME}"
     "?driver=ODBC+Driver+18+for+SQL+Server"
     "&Encrypt=yes&TrustServerCertificate=no"
 )
 
-engine = create_engine(DATABASE_URL)
+# Réplicas de solo lectura separadas por coma (vacío = todo va al primario)
+READ_REPLICA_URLS = [u.strip() for u in os.getenv("DB_REPLICA_URLS", "").split(",") if u.strip()]
+
+# Segundos que una réplica caída queda fuera de la rotación
+REPLICA_RETRY_SECONDS = float(os.getenv("DB_REPLICA_RETRY_SECONDS", "30"))
+
+
+def make_engine(url: str, **kwargs):
+    """
+    Crea un engine con las opciones adecuadas para el dialecto de la URL.
+
+    SQLite necesita check_same_thread=False porque FastAPI ejecuta los
+    endpoints síncronos en un threadpool.
+    """
+    if url.startswith("sqlite"):
+        kwargs.setdefault("connect_args", {"check_same_thread": False})
+    return create_engine(url, **kwargs)
+
+
+engine = make_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# pool_pre_ping detecta réplicas caídas al hacer checkout de la conexión
+read_engines = [make_engine(url, pool_pre_ping=True) for url in READ_REPLICA_URLS]
+ReadSessionFactories = [
+    sessionmaker(autocommit=False, autoflush=False, bind=e) for e in read_engines
+]
+
 Base = declarative_base()
+
+
+class ReadReplicaRouter:
+    """
+    Reparte sesiones de lectura entre réplicas en round-robin.
+
+    Si una réplica no responde al abrir la conexión se marca como caída durante
+    REPLICA_RETRY_SECONDS y se prueba la siguiente; si no queda ninguna, la
+    sesión se abre contra el primario.
+    """
+
+    def __init__(self, factories, fallback, retry_seconds: float = REPLICA_RETRY_SECONDS):
+        self.factories = list(factories)
+        self.fallback = fallback
+        self.retry_seconds = retry_seconds
+        self._next = itertools.count()
+        self._down_until = [0.0] * len(self.factories)
+        self._lock = threading.Lock()
+
+    def session(self):
+        now = time.monotonic()
+        start = next(self._next)
+        for offset in range(len(self.factories)):
+            idx = (start + offset) % len(self.factories)
+            if self._down_until[idx] > now:
+                continue
+            db = self.factories[idx]()
+            try:
+                # Fuerza el checkout para que el fallo ocurra aquí y no en la consulta
+                db.connection()
+                return db
+            except DBAPIError:
+                db.close()
+                with self._lock:
+                    self._down_until[idx] = now + self.retry_seconds
+        return self.fallback()
+
+
+read_router = ReadReplicaRouter(ReadSessionFactories, SessionLocal)
+
+
+@contextmanager
+def read_session():
+    """Sesión de lectura (réplica o primario) que se cierra al salir del bloque."""
+    db = read_router.session()
+    try:
+        yield db
+    finally:
+        db.close()
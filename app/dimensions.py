@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.analytics import snapshot
+
+# Vigencia del cache: cubre departments/jobs escritos por otros workers
+DIMENSION_CACHE_MAX_AGE = float(os.getenv("DIMENSION_CACHE_MAX_AGE_SECONDS", "60"))
+
+# Tabla de dimensión -> (modelo, columna FK en hired_employees, fila fallback)
+DIMENSION_TABLES = {
+    "departments": (models.Department, "department_id", {"id": -1, "department": "Unknown Department"}),
+    "jobs": (models.Job, "job_id", {"id": -1, "job": "Unknown Job"}),
+}
+
+
+class DimensionCache:
+    """
+    Cache en proceso de los ids de departments y jobs.
+
+    Permite validar las claves foráneas de hired_employees con un isin
+    vectorizado, sin consultas por carga. Se actualiza cuando la ingesta
+    escribe en esas tablas y se recarga pasado DIMENSION_CACHE_MAX_AGE.
+    """
+
+    def __init__(self, max_age: float = DIMENSION_CACHE_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._ids = {}
+        self._loaded_at = {}
+
+    def ids(self, db: Session, table_name: str, refresh: bool = False) -> np.ndarray:
+        with self._lock:
+            loaded_at = self._loaded_at.get(table_name)
+            if not refresh and loaded_at is not None and time.monotonic() - loaded_at <= self.max_age:
+                return self._ids[table_name]
+
+        model = DIMENSION_TABLES[table_name][0]
+        ids = np.fromiter(db.execute(select(model.id)).scalars(), dtype="int64")
+        with self._lock:
+            self._ids[table_name] = ids
+            self._loaded_at[table_name] = time.monotonic()
+        return ids
+
+    def add(self, table_name: str, ids):
+        """Registra ids recién confirmados (no fuerza carga si el cache está vacío)."""
+        with self._lock:
+            if table_name in self._ids:
+                self._ids[table_name] = np.union1d(self._ids[table_name], np.asarray(ids, dtype="int64"))
+
+    def invalidate(self, table_name: str = None):
+        with self._lock:
+            for name in [table_name] if table_name else list(self._loaded_at):
+                self._loaded_at.pop(name, None)
+                self._ids.pop(name, None)
+
+    def ensure_fallbacks(self, db: Session):
+        """Crea las filas -1 (Unknown) de departments y jobs si todavía no existen."""
+        created = []
+        for table_name, (model, _, fallback) in DIMENSION_TABLES.items():
+            if -1 not in self.ids(db, table_name):
+                db.add(model(**fallback))
+                created.append(table_name)
+        if created:
+            db.commit()
+            for table_name in created:
+                fallback = DIMENSION_TABLES[table_name][2]
+                self.add(table_name, [-1])
+                snapshot.apply_ingest(table_name, pd.DataFrame([fallback]))
+
+    def validate(self, db: Session, df: pd.DataFrame, default_counts: dict) -> pd.DataFrame:
+        """
+        Reasigna a -1 los department_id / job_id de hired_employees que no existen.
+
+        Solo si aparecen ids desconocidos se recarga el cache una vez (pueden
+        venir de otro worker) antes de reasignar. Los ids reasignados se
+        reportan en default_counts como department_id_unknown / job_id_unknown.
+        """
+        self.ensure_fallbacks(db)
+        for table_name, (_, column, _) in DIMENSION_TABLES.items():
+            unknown = ~df[column].isin(self.ids(db, table_name))
+            if unknown.any():
+                unknown = ~df[column].isin(self.ids(db, table_name, refresh=True))
+            default_counts[f"{column}_unknown"] = int(unknown.sum())
+            if unknown.any():
+                df = df.copy()
+                df.loc[unknown, column] = -1
+        return df
+
+
+dimension_cache = DimensionCache()
@@ -0,0 +1,458 @@
+from abc import ABC, abstractmethod
+import math
+import os
+import threading
+import time
+from typing import NamedTuple, Optional, Tuple
+
+import pandas as pd
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import and_, func, literal, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.analytics import snapshot
+from app.archive import hired_source, insert_archived, partition_catalog
+from app.compression import open_csv_stream
+from app.dimensions import dimension_cache
+from app.versioning import bump_data_version
+
+# Mapeo explícito de nombres de tabla a modelos
+model_map = {
+    "departments": models.Department,
+    "jobs": models.Job,
+    "hired_employees": models.HiredEmployee,
+}
+
+# Columnas que identifican un registro duplicado en cada tabla
+DEDUP_KEYS = {
+    "departments": ["department"],
+    "jobs": ["job"],
+    "hired_employees": ["name", "datetime", "department_id", "job_id"],
+}
+
+BATCH_SIZE = 1000
+IN_LIST_CHUNK = 500
+MERGE_CHUNKSIZE = 50_000
+
+# Vigencia de los conteos de filas cacheados que usa el planner
+TABLE_STATS_MAX_AGE = float(os.getenv("TABLE_STATS_MAX_AGE_SECONDS", "300"))
+
+# Modelo de costos (ms estimados): ida y vuelta a la base, transferencia y
+# procesamiento en pandas por fila
+COST_ROUND_TRIP_MS = float(os.getenv("DEDUP_COST_ROUND_TRIP_MS", "1.0"))
+COST_ROW_TRANSFER_MS = float(os.getenv("DEDUP_COST_ROW_TRANSFER_MS", "0.002"))
+COST_ROW_CPU_MS = float(os.getenv("DEDUP_COST_ROW_CPU_MS", "0.0005"))
+
+# Por encima de estas filas existentes no se carga la tabla completa en un solo DataFrame
+MERGE_MAX_ROWS = int(os.getenv("DEDUP_MERGE_MAX_ROWS", "2000000"))
+
+
+def read_upload(table_name: str, file: UploadFile, db: Session, default_counts: dict) -> pd.DataFrame:
+    """
+    Lee el CSV subido y aplica la limpieza y los valores por defecto de cada tabla.
+
+    Retorna:
+    - DataFrame listo para deduplicar e insertar
+    """
+    df = pd.read_csv(open_csv_stream(file), header=None)
+
+    if table_name == "departments":
+        df.columns = ["id", "department"]
+        df["id"] = df["id"].astype(int)
+        default_counts["department"] = int(df["department"].isna().sum())
+        df["department"] = df["department"].fillna("Unknown Department")
+
+    elif table_name == "jobs":
+        df.columns = ["id", "job"]
+        df["id"] = df["id"].astype(int)
+        default_counts["job"] = int(df["job"].isna().sum())
+        df["job"] = df["job"].fillna("Unknown Job")
+
+    elif table_name == "hired_employees":
+        df.columns = ["id", "name", "datetime", "department_id", "job_id"]
+
+        default_counts["name"] = int(df["name"].isna().sum())
+        default_counts["department_id"] = int(df["department_id"].isna().sum())
+        default_counts["job_id"] = int(df["job_id"].isna().sum())
+
+        df["name"] = df["name"].fillna("Unknown")
+        df["department_id"] = df["department_id"].fillna(-1).astype(int)
+        df["job_id"] = df["job_id"].fillna(-1).astype(int)
+        df["id"] = df["id"].astype(int)
+
+        # Limpieza segura de fechas (mezcla tz-aware y tz-naive)
+        df["datetime"] = df["datetime"].astype(str).str.strip().str.replace(r"[^\x00-\x7F]+", "", regex=True)
+        df["datetime"] = pd.to_datetime(df["datetime"], errors="coerce")
+
+        # Unificar timestamps: convertir tz-aware a tz-naive
+        df["datetime"] = df["datetime"].apply(
+            lambda x: x.tz_convert(None) if hasattr(x, 'tzinfo') and x.tzinfo is not None else x
+        )
+
+        # Contar valores faltantes
+        default_counts["datetime"] = int(df["datetime"].isna().sum())
+
+        # Rellenar valores faltantes con una fecha segura
+        df["datetime"] = pd.to_datetime(df["datetime"].fillna(pd.Timestamp("2000-01-01"))).astype("datetime64[ns]")
+
+        # Filtrar fechas fuera del rango permitido por SQL Server
+        df = df[df["datetime"] >= pd.Timestamp("1753-01-01")]
+
+        # Validar claves foráneas con el cache de dimensiones (ids desconocidos -> -1)
+        df = dimension_cache.validate(db, df, default_counts)
+
+    return df.reset_index(drop=True)
+
+
+def _normalize_existing(existing: pd.DataFrame) -> pd.DataFrame:
+    # Los datetime leídos de la base pueden venir con zona horaria
+    if "datetime" in existing:
+        values = pd.to_datetime(existing["datetime"])
+        if isinstance(values.dtype, pd.DatetimeTZDtype):
+            values = values.dt.tz_localize(None)
+        existing["datetime"] = values.astype("datetime64[ns]")
+    return existing
+
+
+def _matched_mask(df: pd.DataFrame, existing: pd.DataFrame, keys: list) -> pd.Series:
+    """Marca las filas de df cuya clave aparece en existing (sin multiplicar filas por duplicados)."""
+    if existing.empty:
+        return pd.Series(False, index=df.index)
+    matched = df[keys].reset_index().merge(existing[keys].drop_duplicates(), on=keys, how="inner")["index"]
+    return pd.Series(df.index.isin(matched), index=df.index)
+
+
+# ---- Estrategias de deduplicación ----
+
+class DedupStrategy(ABC):
+    """
+    Estrategia de deduplicación contra los registros existentes.
+
+    cost() estima el costo en ms para n filas subidas y N filas existentes
+    (None si no aplica); existing_mask() marca las filas de la carga que ya
+    existen en source (la tabla, o sus particiones relevantes).
+    """
+    name = None
+
+    @abstractmethod
+    def cost(self, n: int, N: int):
+        ...
+
+    @abstractmethod
+    def existing_mask(self, db: Session, source, keys: list, df: pd.DataFrame) -> pd.Series:
+        ...
+
+
+class NoDedup(DedupStrategy):
+    """Sin deduplicación: solo es correcta (y gratis) si la tabla está vacía."""
+    name = "none"
+
+    def cost(self, n, N):
+        return 0.0 if N == 0 else None
+
+    def existing_mask(self, db, source, keys, df):
+        return pd.Series(False, index=df.index)
+
+
+class RowProbe(DedupStrategy):
+    """Una consulta por fila subida (búsqueda por índice)."""
+    name = "row_probe"
+
+    def cost(self, n, N):
+        return n * COST_ROUND_TRIP_MS
+
+    def existing_mask(self, db, source, keys, df):
+        found = []
+        for row in df[keys].itertuples(index=False):
+            values = {k: (v.to_pydatetime() if isinstance(v, pd.Timestamp) else v) for k, v in zip(keys, row)}
+            stmt = select(source.c.id).where(and_(*[source.c[k] == v for k, v in values.items()])).limit(1)
+            found.append(db.execute(stmt).first() is not None)
+        return pd.Series(found, index=df.index, dtype=bool)
+
+
+class InListProbe(DedupStrategy):
+    """
+    Consultas con IN sobre la primera columna de la clave, en bloques de IN_LIST_CHUNK.
+
+    Para claves compuestas se traen los candidatos y se compara la clave
+    completa en pandas (SQL Server no soporta tuplas en IN).
+    """
+    name = "in_list"
+
+    def cost(self, n, N):
+        if N == 0:
+            return COST_ROUND_TRIP_MS
+        return math.ceil(n / IN_LIST_CHUNK) * COST_ROUND_TRIP_MS + n * (COST_ROW_TRANSFER_MS + COST_ROW_CPU_MS)
+
+    def existing_mask(self, db, source, keys, df):
+        probe = source.c[keys[0]]
+        values = df[keys[0]].drop_duplicates().tolist()
+
+        parts = []
+        for i in range(0, len(values), IN_LIST_CHUNK):
+            stmt = select(*[source.c[k] for k in keys]).where(probe.in_(values[i:i + IN_LIST_CHUNK]))
+            parts.append(pd.read_sql(stmt, db.bind))
+        existing = _normalize_existing(pd.concat(parts, ignore_index=True)) if parts else pd.DataFrame(columns=keys)
+        return _matched_mask(df, existing, keys)
+
+
+class FullMerge(DedupStrategy):
+    """Carga las claves de toda la tabla en un DataFrame y cruza con pandas."""
+    name = "merge"
+
+    def cost(self, n, N):
+        if N > MERGE_MAX_ROWS:
+            return None
+        return COST_ROUND_TRIP_MS + N * COST_ROW_TRANSFER_MS + (N + n) * COST_ROW_CPU_MS
+
+    def existing_mask(self, db, source, keys, df):
+        existing = _normalize_existing(pd.read_sql(select(*[source.c[k] for k in keys]), db.bind))
+        return _matched_mask(df, existing, keys)
+
+
+class ChunkedMerge(DedupStrategy):
+    """Como FullMerge, pero leyendo la tabla por bloques: memoria acotada a la carga más un bloque."""
+    name = "chunked_merge"
+
+    def cost(self, n, N):
+        chunks = max(1, math.ceil(N / MERGE_CHUNKSIZE))
+        return chunks * COST_ROUND_TRIP_MS + N * COST_ROW_TRANSFER_MS + (N + chunks * n) * COST_ROW_CPU_MS
+
+    def existing_mask(self, db, source, keys, df):
+        stmt = select(*[source.c[k] for k in keys])
+        mask = pd.Series(False, index=df.index)
+        for chunk in pd.read_sql(stmt, db.bind, chunksize=MERGE_CHUNKSIZE):
+            mask |= _matched_mask(df, _normalize_existing(chunk), keys)
+        return mask
+
+
+STRATEGIES = {s.name: s for s in (NoDedup(), RowProbe(), InListProbe(), FullMerge(), ChunkedMerge())}
+
+
+# ---- Estadísticas y planner ----
+
+class TableStats:
+    """
+    Conteo de filas por tabla cacheado para el planner.
+
+    Se consulta COUNT(*) como mucho cada TABLE_STATS_MAX_AGE segundos y la
+    ingesta de este proceso lo ajusta de forma incremental.
+    """
+
+    def __init__(self, max_age: float = TABLE_STATS_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def row_count(self, db: Session, table_name: str, refresh: bool = False) -> int:
+        with self._lock:
+            cached = self._counts.get(table_name)
+            if not refresh and cached is not None and time.monotonic() - cached[1] <= self.max_age:
+                return cached[0]
+
+        count = db.execute(select(func.count()).select_from(model_map[table_name])).scalar() or 0
+        with self._lock:
+            self._counts[table_name] = (count, time.monotonic())
+        return count
+
+    def add(self, table_name: str, rows: int):
+        with self._lock:
+            if table_name in self._counts:
+                count, loaded_at = self._counts[table_name]
+                self._counts[table_name] = (count + rows, loaded_at)
+
+    def invalidate(self, table_name: str = None):
+        with self._lock:
+            for name in [table_name] if table_name else list(self._counts):
+                self._counts.pop(name, None)
+
+
+table_stats = TableStats()
+
+
+def plan_dedup(n: int, N: int, forced: str = None, exclude: tuple = ()):
+    """
+    Elige la estrategia de deduplicación de menor costo estimado.
+
+    Parámetros:
+    - n: Filas de la carga
+    - N: Filas existentes en la tabla (de table_stats)
+    - forced: Nombre de estrategia a usar sin elegir (rutas antiguas)
+    - exclude: Estrategias descartadas aunque su costo estimado sea menor
+
+    Retorna:
+    - (estrategia, costo estimado, costos de todas las candidatas)
+    """
+    estimates = {name: s.cost(n, N) for name, s in STRATEGIES.items()}
+    if forced is not None:
+        if forced not in STRATEGIES:
+            raise HTTPException(status_code=400, detail=f"Unknown dedup strategy: {forced}")
+        return STRATEGIES[forced], estimates[forced], estimates
+
+    viable = {name: cost for name, cost in estimates.items() if cost is not None and name not in exclude}
+    best = min(viable, key=viable.get)
+    return STRATEGIES[best], viable[best], estimates
+
+
+# ---- Pipeline ----
+
+def on_ingest_committed(table_name: str, df: pd.DataFrame, live_rows: int = None, data_version: int = None):
+    """Hook tras confirmar una ingesta: snapshot de analytics, cache de dimensiones y estadísticas."""
+    snapshot.apply_ingest(table_name, df, data_version)
+    table_stats.add(table_name, len(df) if live_rows is None else live_rows)
+    if table_name in ("departments", "jobs") and not df.empty:
+        dimension_cache.add(table_name, df["id"])
+
+
+def _source_rows(db: Session, table_name: str, archived: dict, archived_years: tuple, include_live: bool,
+                 refresh: bool = False) -> int:
+    """Filas existentes contra las que se deduplica: tabla viva (si entra) más las particiones archivadas."""
+    live = table_stats.row_count(db, table_name, refresh) if include_live else 0
+    return live + sum(archived[y] for y in archived_years)
+
+
+def _is_empty(db: Session, source) -> bool:
+    return db.execute(select(literal(1)).select_from(source).limit(1)).first() is None
+
+
+class DedupPlan(NamedTuple):
+    strategy: DedupStrategy
+    estimated_cost: Optional[float]
+    estimates: dict
+    table_rows: int
+    archived_years: Tuple[int, ...]
+    include_live: bool
+    existing: pd.Series
+
+
+def _archived_upload_years(df: pd.DataFrame, archived: dict) -> tuple:
+    if df.empty:
+        return ()
+    return tuple(sorted(set(df["datetime"].dt.year.unique().tolist()) & set(archived)))
+
+
+def _dedup(db: Session, table_name: str, df: pd.DataFrame, forced: Optional[str], archived: dict) -> DedupPlan:
+    """
+    Elige la estrategia y marca las filas de la carga que ya existen.
+
+    hired_employees solo se compara contra las particiones de los años de la
+    carga (archived es el catálogo de años archivados).
+    """
+    archived_years, include_live = (), True
+    if table_name == "hired_employees" and not df.empty:
+        archived_years = _archived_upload_years(df, archived)
+        include_live = not df["datetime"].dt.year.isin(archived_years).all()
+        source = hired_source(archived_years, include_live)
+    else:
+        source = model_map[table_name].__table__
+    table_rows = _source_rows(db, table_name, archived, archived_years, include_live)
+
+    chosen, estimated_cost, estimates = plan_dedup(len(df), table_rows, forced)
+
+    # "none" solo es correcta con la tabla vacía y el conteo cacheado puede
+    # estar desactualizado (rollbacks, otros workers): se confirma con una
+    # consulta en la transacción y, si hay filas, se replanifica sin ella
+    if forced is None and chosen.name == "none" and not _is_empty(db, source):
+        table_rows = _source_rows(db, table_name, archived, archived_years, include_live, refresh=True)
+        chosen, estimated_cost, estimates = plan_dedup(len(df), table_rows, exclude=("none",))
+
+    existing = chosen.existing_mask(db, source, DEDUP_KEYS[table_name], df)
+    return DedupPlan(chosen, estimated_cost, estimates, table_rows, archived_years, include_live, existing)
+
+
+def _skipped_details(table_name: str, skipped: pd.DataFrame) -> list:
+    if table_name == "hired_employees":
+        return [
+            {
+                "name": r["name"],
+                "datetime": str(r["datetime"]),
+                "department_id": r["department_id"],
+                "job_id": r["job_id"],
+            }
+            for r in skipped.to_dict(orient="records")
+        ]
+    return skipped[DEDUP_KEYS[table_name][0]].tolist()
+
+
+def run_ingest(db: Session, table_name: str, file: UploadFile, strategy: str = "auto",
+               raise_errors: bool = False) -> dict:
+    """
+    Pipeline único de carga de CSV: lectura y limpieza, deduplicación con la
+    estrategia elegida por el planner (o la forzada), inserción por lotes y
+    hooks post-commit.
+
+    Un error inesperado se responde con {"error": ...} tras el rollback; con
+    raise_errors se propaga (500), como hacía la ruta /upload-csv original.
+    """
+    try:
+        model = model_map.get(table_name)
+        if model is None:
+            raise HTTPException(status_code=400, detail="Invalid table name.")
+        # Antes de leer la carga: read_upload ya escribe (ids -1 de respaldo en departments/jobs)
+        if strategy != "auto" and strategy not in STRATEGIES:
+            raise HTTPException(status_code=400, detail=f"Unknown dedup strategy: {strategy}")
+
+        default_counts = {}
+        df = read_upload(table_name, file, db, default_counts)
+
+        forced = None if strategy == "auto" else strategy
+        archived = partition_catalog.archived(db) if table_name == "hired_employees" else {}
+        plan = _dedup(db, table_name, df, forced, archived)
+
+        # bump_data_version toma el lock de la fila de data_version, que archive_year
+        # también toma: desde aquí ningún año se archiva en paralelo. Si se archivó
+        # uno de los años de la carga desde la lectura del catálogo, se deduplica de
+        # nuevo contra las particiones actuales
+        data_version = bump_data_version(db)
+        if table_name == "hired_employees":
+            current = partition_catalog.archived(db, fresh=True)
+            if _archived_upload_years(df, current) != plan.archived_years:
+                plan = _dedup(db, table_name, df, forced, current)
+
+        df_to_insert = df[~plan.existing]
+        duplicates = df[plan.existing]
+
+        # Las filas de años archivados van a su tabla de archivo, el resto a la tabla viva
+        live_df = df_to_insert
+        if plan.archived_years:
+            insert_years = df_to_insert["datetime"].dt.year
+            live_df = df_to_insert[~insert_years.isin(plan.archived_years)]
+            for year in plan.archived_years:
+                part = df_to_insert[insert_years == year]
+                if not part.empty:
+                    insert_archived(db, year, part.to_dict(orient="records"))
+
+        records = live_df.to_dict(orient="records")
+        for i in range(0, len(records), BATCH_SIZE):
+            db.bulk_insert_mappings(model, records[i:i + BATCH_SIZE])
+
+        db.commit()
+        on_ingest_committed(table_name, df_to_insert, live_rows=len(live_df), data_version=data_version)
+
+        return {
+            "message": f"{len(df_to_insert)} new records inserted into '{table_name}'",
+            "duplicates_skipped": len(duplicates),
+            "skipped_details": _skipped_details(table_name, duplicates.head(10)),
+            "defaults_applied": default_counts,
+            "dedup": {
+                "strategy": plan.strategy.name,
+                "forced": strategy != "auto",
+                "estimated_cost_ms": None if plan.estimated_cost is None else round(plan.estimated_cost, 3),
+                "upload_rows": len(df),
+                "table_rows": plan.table_rows,
+                "partitions": {"archived_years": list(plan.archived_years), "live": plan.include_live},
+                "candidates": {k: None if v is None else round(v, 3) for k, v in plan.estimates.items()},
+            },
+        }
+
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        db.rollback()
+        if raise_errors:
+            raise
+        return {
+            "error": "An unexpected error occurred.",
+            "detail": str(e)
+        }
@@ -1,15 +1,20 @@
-from fastapi import FastAPI, UploadFile, File, Depends
-from sqlalchemy import tuple_
-from fastapi import HTTPException
+from fastapi import FastAPI, UploadFile, File, Depends, Query, Request, Response
+from fastapi import Header, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from sqlalchemy import func, extract, case
 from app import models, schemas
-from app.db import SessionLocal, engine, Base
-from app.db_utils import load_dataframe_chunks
-import pandas as pd
-from io import StringIO
+from app.db import SessionLocal, engine, Base, read_session
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.reports import run_preset, run_report
+from app.analytics import snapshot
+from app.admission import UploadAdmissionMiddleware, upload_admission
+from app.singleflight import coalesce, report_flight
+from app.dimensions import dimension_cache
+from app.versioning import bump_data_version, check_not_modified, ensure_data_version, run_versioned, set_validators
+from app.ingest import model_map, run_ingest, table_stats
+from app.archive import archive_year, insert_archived, next_hired_id, partition_catalog, year_summary
+from app.profiling import ProfiledRoute, ProfilingMiddleware, profile_store, require_profiling_token
 from datetime import datetime
+from typing import List, Optional
 import random
 
 
@@ -20,8 +25,19 @@ import random
 # Crear las tablas si no existen
 Base.metadata.create_all(bind=engine)
 
+# Fila única de data_version: desde aquí cada ingesta solo la incrementa
+with SessionLocal() as db:
+    ensure_data_version(db)
+
 app = FastAPI()
 
+# Profiling opt-in por request (X-Profile: 1 + X-Profile-Token)
+app.router.route_class = ProfiledRoute
+app.add_middleware(ProfilingMiddleware)
+
+# Admisión de cargas con las cabeceras, antes de que se lea el cuerpo
+app.add_middleware(UploadAdmissionMiddleware, tables=model_map)
+
 # Dependency para obtener una sesión de base de datos
 def get_db():
     db = SessionLocal()
@@ -30,642 +46,179 @@ def get_db():
     finally:
         db.close()
 
-# Mapeo explícito de nombres de tabla a modelos
-model_map = {
-    "departments": models.Department,
-    "jobs": models.Job,
-    "hired_employees": models.HiredEmployee,
-}
+# Dependency de solo lectura: reportes y exportaciones van a las réplicas
+# (round-robin con failover al primario); la ingesta sigue usando get_db
+def get_read_db():
+    with read_session() as db:
+        yield db
 
+# Dependency de reportes: 304 sin ejecutar la agregación si el cliente ya tiene
+# la versión actual. La versión vista entra en la clave de coalescencia (un
+# request solo se une a un flight iniciado con su misma versión) y la sesión
+# se cierra al terminar la validación, antes de entrar al endpoint
+def report_conditional(request: Request) -> int:
+    with read_session() as db:
+        return check_not_modified(request, db)
+
+# Carga única: el planner elige la deduplicación más barata según el tamaño
+# de la carga y el conteo cacheado de la tabla (strategy=auto), o se fuerza una
+@app.post("/upload/{table_name}")
+def upload(table_name: str, file: UploadFile = File(...), strategy: str = "auto", db: Session = Depends(get_db)):
+    return run_ingest(db, table_name, file, strategy)
+
+# Rutas anteriores: alias que fuerzan su estrategia de deduplicación original.
+# /upload-csv conserva además sus respuestas: tabla inválida -> 200 con
+# {"error": ...} y fallo de la carga -> 500
 @app.post("/upload-csv/{table_name}")
 def upload_csv(table_name: str, file: UploadFile = File(...), db: Session = Depends(get_db)):
-    model = model_map.get(table_name)
-    if model is None:
+    if table_name not in model_map:
         return {"error": "Invalid table name"}
-
-    contents = file.file.read().decode("utf-8")
-    df = pd.read_csv(StringIO(contents), header=None)
-
-    default_counts = {}
-
-    if table_name == "departments":
-        df.columns = ["id", "department"]
-        df["id"] = df["id"].astype(int)
-        default_counts["department"] = int(df["department"].isna().sum())
-        df["department"] = df["department"].fillna("Unknown Department")
-
-    elif table_name == "jobs":
-        df.columns = ["id", "job"]
-        df["id"] = df["id"].astype(int)
-        default_counts["job"] = int(df["job"].isna().sum())
-        df["job"] = df["job"].fillna("Unknown Job")
-
-    elif table_name == "hired_employees":
-        df.columns = ["id", "name", "datetime", "department_id", "job_id"]
-
-        default_counts["name"] = int(df["name"].isna().sum())
-        default_counts["department_id"] = int(df["department_id"].isna().sum())
-        default_counts["job_id"] = int(df["job_id"].isna().sum())
-
-        df["name"] = df["name"].fillna("Unknown")
-        df["department_id"] = df["department_id"].fillna(-1).astype(int)
-        df["job_id"] = df["job_id"].fillna(-1).astype(int)
-        df["id"] = df["id"].astype(int)
-
-        # Limpieza segura de fechas (mezcla tz-aware y tz-naive)
-        df["datetime"] = df["datetime"].astype(str).str.strip().str.replace(r"[^\x00-\x7F]+", "", regex=True)
-        df["datetime"] = pd.to_datetime(df["datetime"], errors="coerce")
-
-        # Unificar timestamps: convertir tz-aware a tz-naive
-        df["datetime"] = df["datetime"].apply(
-            lambda x: x.tz_convert(None) if hasattr(x, 'tzinfo') and x.tzinfo is not None else x
-        )
-
-        # Contar valores faltantes
-        default_counts["datetime"] = int(df["datetime"].isna().sum())
-
-        # Rellenar valores faltantes con una fecha segura
-        df["datetime"] = df["datetime"].fillna(pd.Timestamp("2000-01-01"))
-
-        # Filtrar fechas fuera del rango permitido por SQL Server
-        df = df[df["datetime"] >= pd.Timestamp("1753-01-01")]
-
-        # Crear claves foráneas fallback si no existen
-        if not db.query(models.Department).filter_by(id=-1).first():
-            db.add(models.Department(id=-1, department="Unknown Department"))
-        if not db.query(models.Job).filter_by(id=-1).first():
-            db.add(models.Job(id=-1, job="Unknown Job"))
-        db.commit()
-
-    # Conversión a lista de registros
-    records = df.to_dict(orient="records")
-
-    # Inserción por lotes
-    BATCH_SIZE = 1000
-    for i in range(0, len(records), BATCH_SIZE):
-        db.bulk_insert_mappings(model, records[i:i + BATCH_SIZE])
-
-    db.commit()
-
-    return {
-        "message": f"{len(records)} records inserted into {table_name}",
-        "defaults_applied": default_counts
-    }
-
-
-
+    return run_ingest(db, table_name, file, "none", raise_errors=True)
 
 @app.post("/upload-csv-com/{table_name}")
-def upload_csv(table_name: str, file: UploadFile = File(...), db: Session = Depends(get_db)):
-    try:
-        model = model_map.get(table_name)
-        if model is None:
-            raise HTTPException(status_code=400, detail="Invalid table name.")
-
-        contents = file.file.read().decode("utf-8")
-        df = pd.read_csv(StringIO(contents), header=None)
-
-        default_counts = {}
-        duplicates_skipped = []
-        records_filtered = []
-
-        if table_name == "departments":
-            df.columns = ["id", "department"]
-            df["id"] = df["id"].astype(int)
-            default_counts["department"] = int(df["department"].isna().sum())
-            df["department"] = df["department"].fillna("Unknown Department")
-
-        elif table_name == "jobs":
-            df.columns = ["id", "job"]
-            df["id"] = df["id"].astype(int)
-            default_counts["job"] = int(df["job"].isna().sum())
-            df["job"] = df["job"].fillna("Unknown Job")
-
-        elif table_name == "hired_employees":
-            df.columns = ["id", "name", "datetime", "department_id", "job_id"]
-            default_counts["name"] = int(df["name"].isna().sum())
-            default_counts["department_id"] = int(df["department_id"].isna().sum())
-            default_counts["job_id"] = int(df["job_id"].isna().sum())
-
-            df["name"] = df["name"].fillna("Unknown")
-            df["department_id"] = df["department_id"].fillna(-1).astype(int)
-            df["job_id"] = df["job_id"].fillna(-1).astype(int)
-            df["id"] = df["id"].astype(int)
-
-            df["datetime"] = df["datetime"].astype(str).str.strip().str.replace(r"[^\x00-\x7F]+", "", regex=True)
-            df["datetime"] = pd.to_datetime(df["datetime"], errors="coerce")
-            df["datetime"] = df["datetime"].apply(
-                lambda x: x.tz_convert(None) if hasattr(x, 'tzinfo') and x.tzinfo is not None else x
-            )
-
-            default_counts["datetime"] = int(df["datetime"].isna().sum())
-            df["datetime"] = df["datetime"].fillna(pd.Timestamp("2000-01-01"))
-            df = df[df["datetime"] >= pd.Timestamp("1753-01-01")]
-
-            if not db.query(models.Department).filter_by(id=-1).first():
-                db.add(models.Department(id=-1, department="Unknown Department"))
-            if not db.query(models.Job).filter_by(id=-1).first():
-                db.add(models.Job(id=-1, job="Unknown Job"))
-            db.commit()
-
-        records = df.to_dict(orient="records")
-
-        if table_name == "departments":
-            for r in records:
-                exists = db.query(models.Department).filter_by(department=r["department"]).first()
-                if not exists:
-                    records_filtered.append(r)
-                else:
-                    duplicates_skipped.append(r["department"])
-
-        elif table_name == "jobs":
-            for r in records:
-                exists = db.query(models.Job).filter_by(job=r["job"]).first()
-                if not exists:
-                    records_filtered.append(r)
-                else:
-                    duplicates_skipped.append(r["job"])
-
-        elif table_name == "hired_employees":
-            for r in records:
-                exists = db.query(models.HiredEmployee).filter_by(
-                    name=r["name"],
-                    datetime=r["datetime"],
-                    department_id=r["department_id"],
-                    job_id=r["job_id"]
-                ).first()
-                if not exists:
-                    records_filtered.append(r)
-                else:
-                    duplicates_skipped.append({
-                        "name": r["name"],
-                        "datetime": str(r["datetime"]),
-                        "department_id": r["department_id"],
-                        "job_id": r["job_id"]
-                    })
-
-        BATCH_SIZE = 1000
-        for i in range(0, len(records_filtered), BATCH_SIZE):
-            db.bulk_insert_mappings(model, records_filtered[i:i + BATCH_SIZE])
-
-        db.commit()
-
-        return {
-            "message": f"{len(records_filtered)} new records inserted into '{table_name}'",
-            "duplicates_skipped": len(duplicates_skipped),
-            "skipped_details": duplicates_skipped[:10],
-            "defaults_applied": default_counts
-        }
-
-    except HTTPException as e:
-        raise e
-    except Exception as e:
-        db.rollback()
-        return {
-            "error": "An unexpected error occurred.",
-            "detail": str(e)
-        }
-
-
+def upload_csv_row_probe(table_name: str, file: UploadFile = File(...), db: Session = Depends(get_db)):
+    return run_ingest(db, table_name, file, "row_probe")
 
 @app.post("/upload-csvs-sql/{table_name}")
-def upload_csv(table_name: str, file: UploadFile = File(...), db: Session = Depends(get_db)):
-    try:
-        model = model_map.get(table_name)
-        if model is None:
-            raise HTTPException(status_code=400, detail="Invalid table name.")
-
-        contents = file.file.read().decode("utf-8")
-        df = pd.read_csv(StringIO(contents), header=None)
-
-        default_counts = {}
-        duplicates_skipped = []
-        records_filtered = []
-
-        if table_name == "departments":
-            df.columns = ["id", "department"]
-            df["id"] = df["id"].astype(int)
-            default_counts["department"] = int(df["department"].isna().sum())
-            df["department"] = df["department"].fillna("Unknown Department")
-
-        elif table_name == "jobs":
-            df.columns = ["id", "job"]
-            df["id"] = df["id"].astype(int)
-            default_counts["job"] = int(df["job"].isna().sum())
-            df["job"] = df["job"].fillna("Unknown Job")
-
-        elif table_name == "hired_employees":
-            df.columns = ["id", "name", "datetime", "department_id", "job_id"]
-
-            default_counts["name"] = int(df["name"].isna().sum())
-            default_counts["department_id"] = int(df["department_id"].isna().sum())
-            default_counts["job_id"] = int(df["job_id"].isna().sum())
-
-            df["name"] = df["name"].fillna("Unknown")
-            df["department_id"] = df["department_id"].fillna(-1).astype(int)
-            df["job_id"] = df["job_id"].fillna(-1).astype(int)
-            df["id"] = df["id"].astype(int)
-
-            df["datetime"] = df["datetime"].astype(str).str.strip().str.replace(r"[^\x00-\x7F]+", "", regex=True)
-            df["datetime"] = pd.to_datetime(df["datetime"], errors="coerce")
-            df["datetime"] = df["datetime"].apply(
-                lambda x: x.tz_convert(None) if hasattr(x, 'tzinfo') and x.tzinfo is not None else x
-            )
-
-            default_counts["datetime"] = int(df["datetime"].isna().sum())
-            df["datetime"] = df["datetime"].fillna(pd.Timestamp("2000-01-01"))
-            df = df[df["datetime"] >= pd.Timestamp("1753-01-01")]
-
-            if not db.query(models.Department).filter_by(id=-1).first():
-                db.add(models.Department(id=-1, department="Unknown Department"))
-            if not db.query(models.Job).filter_by(id=-1).first():
-                db.add(models.Job(id=-1, job="Unknown Job"))
-            db.commit()
-
-        records = df.to_dict(orient="records")
-
-        if table_name == "departments":
-            keys = set((r["department"],) for r in records)
-            existing = db.query(models.Department.department).filter(models.Department.department.in_([k[0] for k in keys])).all()
-            existing_set = set((e[0] for e in existing))
-
-            for r in records:
-                if (r["department"],) not in existing_set:
-                    records_filtered.append(r)
-                else:
-                    duplicates_skipped.append(r["department"])
-
-        elif table_name == "jobs":
-            keys = set((r["job"],) for r in records)
-            existing = db.query(models.Job.job).filter(models.Job.job.in_([k[0] for k in keys])).all()
-            existing_set = set((e[0] for e in existing))
-
-            for r in records:
-                if (r["job"],) not in existing_set:
-                    records_filtered.append(r)
-                else:
-                    duplicates_skipped.append(r["job"])
-
-        elif table_name == "hired_employees":
-            batch_keys = set(
-                (r["name"], r["datetime"], r["department_id"], r["job_id"])
-                for r in records
-            )
-
-            existing = db.query(
-                models.HiredEmployee.name,
-                models.HiredEmployee.datetime,
-                models.HiredEmployee.department_id,
-                models.HiredEmployee.job_id
-            ).filter(
-                tuple_(
-                    models.HiredEmployee.name,
-                    models.HiredEmployee.datetime,
-                    models.HiredEmployee.department_id,
-                    models.HiredEmployee.job_id
-                ).in_(batch_keys)
-            ).all()
-
-            existing_set = set(existing)
-
-            for r in records:
-                key = (r["name"], r["datetime"], r["department_id"], r["job_id"])
-                if key not in existing_set:
-                    records_filtered.append(r)
-                else:
-                    duplicates_skipped.append({
-                        "name": r["name"],
-                        "datetime": str(r["datetime"]),
-                        "department_id": r["department_id"],
-                        "job_id": r["job_id"]
-                    })
-
-        BATCH_SIZE = 1000
-        for i in range(0, len(records_filtered), BATCH_SIZE):
-            db.bulk_insert_mappings(model, records_filtered[i:i + BATCH_SIZE])
-
-        db.commit()
-
-        return {
-            "message": f"{len(records_filtered)} new records inserted into '{table_name}'",
-            "duplicates_skipped": len(duplicates_skipped),
-            "skipped_details": duplicates_skipped[:10],
-            "defaults_applied": default_counts
-        }
-
-    except HTTPException as e:
-        raise e
-    except Exception as e:
-        db.rollback()
-        return {
-            "error": "An unexpected error occurred.",
-            "detail": str(e)
-        }
-
-
+def upload_csv_in_list(table_name: str, file: UploadFile = File(...), db: Session = Depends(get_db)):
+    return run_ingest(db, table_name, file, "in_list")
 
 @app.post("/upload-csv-df-sql/{table_name}")
 def upload_csv_with_merge(table_name: str, file: UploadFile = File(...), db: Session = Depends(get_db)):
-    try:
-        model = model_map.get(table_name)
-        if model is None:
-            raise HTTPException(status_code=400, detail="Invalid table name.")
-
-        contents = file.file.read().decode("utf-8")
-        df = pd.read_csv(StringIO(contents), header=None)
-
-        default_counts = {}
-
-        if table_name == "departments":
-            df.columns = ["id", "department"]
-            df["id"] = df["id"].astype(int)
-            default_counts["department"] = int(df["department"].isna().sum())
-            df["department"] = df["department"].fillna("Unknown Department")
-
-            # Obtener los registros existentes
-            existing_df = pd.read_sql(select(model.department), db.bind)
-            df_unique = df.merge(existing_df, on="department", how="left", indicator=True)
-            df_to_insert = df_unique[df_unique["_merge"] == "left_only"].drop(columns=["_merge"])
-
-        elif table_name == "jobs":
-            df.columns = ["id", "job"]
-            df["id"] = df["id"].astype(int)
-            default_counts["job"] = int(df["job"].isna().sum())
-            df["job"] = df["job"].fillna("Unknown Job")
-
-            existing_df = pd.read_sql(select(model.job), db.bind)
-            df_unique = df.merge(existing_df, on="job", how="left", indicator=True)
-            df_to_insert = df_unique[df_unique["_merge"] == "left_only"].drop(columns=["_merge"])
-
-        elif table_name == "hired_employees":
-            df.columns = ["id", "name", "datetime", "department_id", "job_id"]
-
-            default_counts["name"] = int(df["name"].isna().sum())
-            default_counts["department_id"] = int(df["department_id"].isna().sum())
-            default_counts["job_id"] = int(df["job_id"].isna().sum())
-
-            df["name"] = df["name"].fillna("Unknown")
-            df["department_id"] = df["department_id"].fillna(-1).astype(int)
-            df["job_id"] = df["job_id"].fillna(-1).astype(int)
-            df["id"] = df["id"].astype(int)
-
-            df["datetime"] = df["datetime"].astype(str).str.strip().str.replace(r"[^\x00-\x7F]+", "", regex=True)
-            df["datetime"] = pd.to_datetime(df["datetime"], errors="coerce")
-            df["datetime"] = df["datetime"].apply(
-                lambda x: x.tz_convert(None) if hasattr(x, 'tzinfo') and x.tzinfo is not None else x
-            )
-
-            default_counts["datetime"] = int(df["datetime"].isna().sum())
-            df["datetime"] = df["datetime"].fillna(pd.Timestamp("2000-01-01"))
-            df = df[df["datetime"] >= pd.Timestamp("1753-01-01")]
-
-            if not db.query(models.Department).filter_by(id=-1).first():
-                db.add(models.Department(id=-1, department="Unknown Department"))
-            if not db.query(models.Job).filter_by(id=-1).first():
-                db.add(models.Job(id=-1, job="Unknown Job"))
-            db.commit()
-
-            # Cargar registros existentes y quitar zona horaria
-            existing_df = pd.read_sql(select(
-                model.name,
-                model.datetime,
-                model.department_id,
-                model.job_id
-            ), db.bind)
-
-            if pd.api.types.is_datetime64tz_dtype(existing_df["datetime"]):
-                existing_df["datetime"] = existing_df["datetime"].dt.tz_localize(None)
-
-            df_merge = df.merge(
-                existing_df,
-                on=["name", "datetime", "department_id", "job_id"],
-                how="left",
-                indicator=True
-            )
-
-            df_to_insert = df_merge[df_merge["_merge"] == "left_only"].drop(columns=["_merge"])
-
-
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported table")
-
-        records = df_to_insert.to_dict(orient="records")
-
-        BATCH_SIZE = 1000
-        for i in range(0, len(records), BATCH_SIZE):
-            db.bulk_insert_mappings(model, records[i:i + BATCH_SIZE])
-        db.commit()
-
-        return {
-            "message": f"{len(records)} new records inserted into '{table_name}'",
-            "duplicates_skipped": len(df) - len(records),
-            "defaults_applied": default_counts
-        }
+    return run_ingest(db, table_name, file, "merge")
 
-    except HTTPException as e:
-        raise e
-    except Exception as e:
-        db.rollback()
-        return {
-            "error": "An unexpected error occurred.",
-            "detail": str(e)
-        }
+@app.post("/upload-csv-dfa-sql/{table_name}")
+def upload_csv_with_chunked_merge(table_name: str, file: UploadFile = File(...), db: Session = Depends(get_db)):
+    return run_ingest(db, table_name, file, "chunked_merge")
 
 
+# Archivo por año de hired_employees: mueve un año cerrado a hired_employees_<año>
+# con su resumen; reportes y deduplicación solo leen las particiones necesarias
+@app.post("/archive/{year}")
+def archive_hired_employees(year: int, db: Session = Depends(get_db)):
+    result = archive_year(db, year)
+    table_stats.invalidate()
+    return result
 
-#revisar
+@app.get("/archive")
+def list_archived_years(db: Session = Depends(get_read_db)):
+    rows = db.query(models.ArchivedPartition).order_by(models.ArchivedPartition.year).all()
+    return [
+        {"year": r.year, "table": r.table_name, "rows": r.row_count, "archived_at": r.archived_at}
+        for r in rows
+    ]
 
+@app.get("/archive/{year}/summary")
+def archived_year_summary(year: int, db: Session = Depends(get_read_db)):
+    return year_summary(db, year)
 
-@app.post("/upload-csv-dfa-sql/{table_name}")
-def upload_csv_with_merge(table_name: str, file: UploadFile = File(...), db: Session = Depends(get_db)):
-    try:
-        model = model_map.get(table_name)
-        if model is None:
-            raise HTTPException(status_code=400, detail="Invalid table name.")
-
-        contents = file.file.read().decode("utf-8")
-        df = pd.read_csv(StringIO(contents), header=None)
-
-        default_counts = {}
-
-        if table_name == "departments":
-            df.columns = ["id", "department"]
-            df["id"] = df["id"].astype(int)
-            default_counts["department"] = int(df["department"].isna().sum())
-            df["department"] = df["department"].fillna("Unknown Department")
-
-            # Obtener los registros existentes
-            existing_df = pd.read_sql(select(model.department), db.bind)
-            df_unique = df.merge(existing_df, on="department", how="left", indicator=True)
-            df_to_insert = df_unique[df_unique["_merge"] == "left_only"].drop(columns=["_merge"])
-
-        elif table_name == "jobs":
-            df.columns = ["id", "job"]
-            df["id"] = df["id"].astype(int)
-            default_counts["job"] = int(df["job"].isna().sum())
-            df["job"] = df["job"].fillna("Unknown Job")
-
-            existing_df = pd.read_sql(select(model.job), db.bind)
-            df_unique = df.merge(existing_df, on="job", how="left", indicator=True)
-            df_to_insert = df_unique[df_unique["_merge"] == "left_only"].drop(columns=["_merge"])
-
-        elif table_name == "hired_employees":
-            df.columns = ["id", "name", "datetime", "department_id", "job_id"]
-
-            default_counts["name"] = int(df["name"].isna().sum())
-            default_counts["department_id"] = int(df["department_id"].isna().sum())
-            default_counts["job_id"] = int(df["job_id"].isna().sum())
-
-            df["name"] = df["name"].fillna("Unknown")
-            df["department_id"] = df["department_id"].fillna(-1).astype(int)
-            df["job_id"] = df["job_id"].fillna(-1).astype(int)
-            df["id"] = df["id"].astype(int)
-
-            df["datetime"] = df["datetime"].astype(str).str.strip().str.replace(r"[^\x00-\x7F]+", "", regex=True)
-            df["datetime"] = pd.to_datetime(df["datetime"], errors="coerce")
-            df["datetime"] = df["datetime"].apply(
-                lambda x: x.tz_convert(None) if hasattr(x, 'tzinfo') and x.tzinfo is not None else x
-            )
-
-            default_counts["datetime"] = int(df["datetime"].isna().sum())
-            df["datetime"] = df["datetime"].fillna(pd.Timestamp("2000-01-01"))
-            df = df[df["datetime"] >= pd.Timestamp("1753-01-01")]
-
-            if not db.query(models.Department).filter_by(id=-1).first():
-                db.add(models.Department(id=-1, department="Unknown Department"))
-            if not db.query(models.Job).filter_by(id=-1).first():
-                db.add(models.Job(id=-1, job="Unknown Job"))
-            db.commit()
-
-            # Cargar registros existentes y quitar zona horaria
-            existing_df = load_dataframe_chunks(
-                model=model,
-                columns=[model.name, model.datetime, model.department_id, model.job_id],
-                db_bind=db.bind
-            )
-
-            if pd.api.types.is_datetime64tz_dtype(existing_df["datetime"]):
-                existing_df["datetime"] = existing_df["datetime"].dt.tz_localize(None)
-
-            df_merge = df.merge(
-                existing_df,
-                on=["name", "datetime", "department_id", "job_id"],
-                how="left",
-                indicator=True
-            )
-
-            df_to_insert = df_merge[df_merge["_merge"] == "left_only"].drop(columns=["_merge"])
-
-
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported table")
-
-        records = df_to_insert.to_dict(orient="records")
-
-        BATCH_SIZE = 1000
-        for i in range(0, len(records), BATCH_SIZE):
-            db.bulk_insert_mappings(model, records[i:i + BATCH_SIZE])
-        db.commit()
-
-        return {
-            "message": f"{len(records)} new records inserted into '{table_name}'",
-            "duplicates_skipped": len(df) - len(records),
-            "defaults_applied": default_counts
-        }
 
-    except HTTPException as e:
-        raise e
-    except Exception as e:
-        db.rollback()
-        return {
-            "error": "An unexpected error occurred.",
-            "detail": str(e)
-        }
+@app.get("/metrics/ingest-admission")
+def ingest_admission_stats():
+    return upload_admission.stats()
+
+@app.get("/metrics/report-coalescing")
+def report_coalescing_stats():
+    return report_flight.stats()
+
+@app.get("/debug/profiles/{profile_id}")
+def get_profile(profile_id: str, x_profile_token: Optional[str] = Header(None)):
+    require_profiling_token(x_profile_token)
+    report = profile_store.get(profile_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return report
 
 
 ####----------------------######
 # Reports
 #####----------------------######
 
+# Los reportes se calculan en funciones con @coalesce que abren su sesión de
+# lectura dentro del cuerpo: solo el request líder toma una conexión del pool.
+# Cada una lee data_version en esa misma sesión antes del reporte y la retorna
+# con la página; el endpoint pone ETag / Last-Modified con esa versión
+
+@coalesce("hirings")
+def coalesced_report(dimensions, measures, filters, order, above_average_year, limit, cursor, data_version):
+    with read_session() as db:
+        return run_versioned(db, lambda version: run_report(
+            db, dimensions, measures, filters,
+            order=order, above_average_year=above_average_year, limit=limit, cursor=cursor,
+            data_version=version,
+        ))
+
+@coalesce("preset")
+def coalesced_preset(name, limit, cursor, data_version):
+    with read_session() as db:
+        return run_versioned(db, lambda version: run_preset(db, name, limit, cursor, data_version=version))
+
+@app.get("/report/hirings")
+def hirings_report(
+    request: Request,
+    response: Response,
+    dimensions: List[str] = Query(["department", "job"]),
+    measures: List[str] = Query(["hired"]),
+    year: Optional[int] = None,
+    quarter: Optional[int] = Query(None, ge=1, le=4),
+    month: Optional[int] = Query(None, ge=1, le=12),
+    department_id: Optional[int] = None,
+    job_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    order: str = "dimensions",
+    above_average_year: Optional[int] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    data_version: int = Depends(report_conditional),
+):
+    filters = {
+        "year": year,
+        "quarter": quarter,
+        "month": month,
+        "department_id": department_id,
+        "job_id": job_id,
+        "date_from": date_from,
+        "date_to": date_to,
+    }
+    served = coalesced_report(
+        dimensions, measures, filters, order, above_average_year, limit, cursor, data_version
+    )
+    return set_validators(request, response, served)
+
+# Los reportes originales son presets del reporte genérico
 @app.get("/report/hirings-per-quarter")
-def hirings_per_quarter(db: Session = Depends(get_db)):
-    results = db.query(
-        models.Department.department,
-        models.Job.job,
-        func.sum(case((extract("quarter", models.HiredEmployee.datetime) == 1, 1), else_=0)).label("Q1"),
-        func.sum(case((extract("quarter", models.HiredEmployee.datetime) == 2, 1), else_=0)).label("Q2"),
-        func.sum(case((extract("quarter", models.HiredEmployee.datetime) == 3, 1), else_=0)).label("Q3"),
-        func.sum(case((extract("quarter", models.HiredEmployee.datetime) == 4, 1), else_=0)).label("Q4"),
-    ).join(models.Department, models.HiredEmployee.department_id == models.Department.id
-    ).join(models.Job, models.HiredEmployee.job_id == models.Job.id
-    ).filter(extract("year", models.HiredEmployee.datetime) == 2021
-    ).group_by(models.Department.department, models.Job.job
-    ).order_by(models.Department.department, models.Job.job).all()
-
-    return [dict(r._asdict()) for r in results]
+def hirings_per_quarter(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    data_version: int = Depends(report_conditional),
+):
+    served = coalesced_preset("hirings-per-quarter", limit, cursor, data_version)
+    return set_validators(request, response, served)
 
 @app.get("/report/above-average-hirings-2021")
-def above_average_hirings(db: Session = Depends(get_db)):
-    subquery = db.query(
-        models.HiredEmployee.department_id,
-        func.count(models.HiredEmployee.id).label("hired")
-    ).filter(
-        extract("year", models.HiredEmployee.datetime) == 2021
-    ).group_by(models.HiredEmployee.department_id).subquery()
-
-    avg = db.query(func.avg(subquery.c.hired)).scalar()
-
-    result = db.query(
-        models.Department.id,
-        models.Department.department,
-        subquery.c.hired
-    ).join(subquery, models.Department.id == subquery.c.department_id
-    ).filter(subquery.c.hired > avg
-    ).order_by(subquery.c.hired.desc()).all()
-
-    return [dict(r._asdict()) for r in result]
+def above_average_hirings(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    data_version: int = Depends(report_conditional),
+):
+    served = coalesced_preset("above-average-hirings-2021", limit, cursor, data_version)
+    return set_validators(request, response, served)
 
 @app.get("/report/above-average-hirings-all")
-def above_average_hirings(db: Session = Depends(get_db)):
-    subquery_2021 = db.query(
-        models.HiredEmployee.department_id,
-        func.count(models.HiredEmployee.id).label("count_per_dept")
-    ).filter(
-        extract("year", models.HiredEmployee.datetime) == 2021
-    ).group_by(
-        models.HiredEmployee.department_id
-    ).subquery()
-
-    avg_hiring_2021 = db.query(func.avg(subquery_2021.c.count_per_dept * 1.0 )).scalar()
-    
-    subquery_all_hirings = db.query(
-        models.Department.id.label("department_id"),
-        models.Department.department,
-        func.count(models.HiredEmployee.id).label("total_hired")
-    ).join(
-        models.HiredEmployee, 
-        models.HiredEmployee.department_id == models.Department.id
-    ).group_by(
-        models.Department.id,models.Department.department
-    ).subquery()
-
-    result = db.query(
-        subquery_all_hirings.c.department_id,
-        subquery_all_hirings.c.department,
-        subquery_all_hirings.c.total_hired
-    ).filter(
-        subquery_all_hirings.c.total_hired > avg_hiring_2021
-    ).order_by(
-        subquery_all_hirings.c.total_hired.desc()
-    ).all()
-    return [
-        {
-            "department_id": r.department_id,
-            "department": r.department,
-            "total_hired": r.total_hired
-        }
-        for r in result
-    ]
+def above_average_hirings(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    data_version: int = Depends(report_conditional),
+):
+    served = coalesced_preset("above-average-hirings-all", limit, cursor, data_version)
+    return set_validators(request, response, served)
 
 
 
@@ -707,13 +260,30 @@ def seed_data(db: Session = Depends(get_db)):
     depts = db.query(models.Department).all()
     jobs = db.query(models.Job).all()
 
-    for _ in range(50):
-        employee = models.HiredEmployee(
-            name=random.choice(names),
-            datetime=datetime.strptime(f"2021-{random.randint(1,12)}-{random.randint(1,28)}", "%Y-%m-%d"),
-            department_id=random.choice(depts).id,
-            job_id=random.choice(jobs).id
-        )
-        db.add(employee)
+    # La versión se incrementa antes de insertar: su lock serializa con archive_year,
+    # así el catálogo leído a continuación no cambia hasta el commit
+    bump_data_version(db)
+    archived = partition_catalog.archived(db, fresh=True)
+
+    # Ids explícitos: el autoincremento de la tabla viva no ve los ids archivados
+    first_id = next_hired_id(db, archived)
+    employees = [
+        {
+            "id": first_id + i,
+            "name": random.choice(names),
+            "datetime": datetime.strptime(f"2021-{random.randint(1,12)}-{random.randint(1,28)}", "%Y-%m-%d"),
+            "department_id": random.choice(depts).id,
+            "job_id": random.choice(jobs).id,
+        }
+        for i in range(50)
+    ]
+    # Si 2021 ya está archivado, las filas van a hired_employees_2021
+    if 2021 in archived:
+        insert_archived(db, 2021, employees)
+    else:
+        db.bulk_insert_mappings(models.HiredEmployee, employees)
     db.commit()
+    snapshot.invalidate()
+    dimension_cache.invalidate()
+    table_stats.invalidate()
     return {"message": "Seeded dummy data"}
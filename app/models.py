@@ -19,3 +19,27 @@ class HiredEmployee(Base):
     datetime = Column(DateTime(timezone=True))  # ← CAMBIO AQUÍ
     department_id = Column(Integer, ForeignKey("departments.id"))
     job_id = Column(Integer, ForeignKey("jobs.id"))
+
+class DataVersion(Base):
+    # Fila única (id=1) que se incrementa en cada ingesta confirmada (ETag de reportes)
+    __tablename__ = "data_version"
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True))
+
+class ArchivedPartition(Base):
+    # Catálogo de años cerrados movidos a su tabla hired_employees_<año>
+    __tablename__ = "hired_employees_partitions"
+    year = Column(Integer, primary_key=True)
+    table_name = Column(String(100))
+    row_count = Column(Integer, nullable=False, default=0)
+    archived_at = Column(DateTime(timezone=True))
+
+class HiredEmployeeSummary(Base):
+    # Resumen agregado de cada año archivado
+    __tablename__ = "hired_employees_summary"
+    year = Column(Integer, primary_key=True)
+    quarter = Column(Integer, primary_key=True)
+    department_id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, primary_key=True)
+    hired = Column(Integer, nullable=False)
@@ -0,0 +1,58 @@
+import base64
+import json
+
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(values: dict) -> str:
+    """
+    Codifica la clave de la última fila de una página como cursor opaco (base64 url-safe).
+    """
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: dict) -> dict:
+    """
+    Decodifica un cursor generado por encode_cursor.
+
+    Parámetros:
+    - cursor: Cursor recibido del cliente
+    - keys: Claves que debe contener (las columnas de orden del reporte) -> tipo (int o str)
+
+    Retorna:
+    - Diccionario con los valores de la última fila vista
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+    if not isinstance(values, dict) or set(values) != set(keys):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    # Un valor de otro tipo daría una página equivocada o un error de conversión en la base
+    # (bool es subclase de int, pero nunca es una clave válida)
+    for name, expected in keys.items():
+        value = values[name]
+        if isinstance(value, bool) or not isinstance(value, expected):
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+    return values
+
+
+def paginate(rows: list, limit: int, keys: list) -> dict:
+    """
+    Arma la respuesta paginada a partir de limit + 1 filas.
+
+    La fila extra solo indica que hay otra página; el cursor apunta a la
+    última fila devuelta.
+    """
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor({k: last[k] for k in keys})
+    return {"items": items, "next_cursor": next_cursor}
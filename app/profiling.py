@@ -0,0 +1,320 @@
+import asyncio
+import collections
+import functools
+import hmac
+import inspect
+import os
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.interfaces import ExecuteStyle
+
+# Sin token configurado el profiling queda deshabilitado por completo
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5")) / 1000
+PROFILE_STORE_SIZE = int(os.getenv("PROFILE_STORE_SIZE", "50"))
+
+MAX_STACK_DEPTH = 64
+MAX_STATEMENT_LENGTH = 2000
+TOP_STACKS = 50
+
+_active: ContextVar[Optional["ProfileSession"]] = ContextVar("active_profile", default=None)
+
+
+class ProfileSession:
+    """
+    Perfil de un request: muestras de CPU de los threads que lo atienden y las
+    sentencias SQL ejecutadas con su duración y filas afectadas.
+    """
+
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.started_at = datetime.now(timezone.utc)
+        self.status_code = None
+        self.duration_ms = None
+        self.statements = []
+        self.samples = collections.Counter()
+        self.sample_count = 0
+        self._threads = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample, name=f"profile-{self.id[:8]}", daemon=True)
+
+    def add_thread(self, thread_id: int):
+        with self._lock:
+            self._threads.add(thread_id)
+
+    def remove_thread(self, thread_id: int):
+        with self._lock:
+            self._threads.discard(thread_id)
+
+    def start(self):
+        self._sampler.start()
+
+    def stop(self, status_code: Optional[int]):
+        self._stopped.set()
+        self._sampler.join()
+        self.status_code = status_code
+        self.duration_ms = round((time.perf_counter() - self._started) * 1000, 3)
+
+    def _sample(self):
+        # Muestreo periódico de las pilas de los threads registrados (sys._current_frames)
+        while not self._stopped.wait(PROFILE_SAMPLE_INTERVAL):
+            with self._lock:
+                threads = list(self._threads)
+            frames = sys._current_frames()
+            for thread_id in threads:
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+                self.sample_count += 1
+
+    def record_statement(self, statement: str, duration_ms: float, rowcount: int, executemany: bool) -> dict:
+        entry = {
+            "statement": statement[:MAX_STATEMENT_LENGTH],
+            "duration_ms": round(duration_ms, 3),
+            "rowcount": rowcount,
+            "executemany": executemany,
+        }
+        with self._lock:
+            self.statements.append(entry)
+        return entry
+
+    def report(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "started_at": self.started_at.isoformat(),
+            "status_code": self.status_code,
+            "duration_ms": self.duration_ms,
+            "cpu": {
+                "interval_ms": PROFILE_SAMPLE_INTERVAL * 1000,
+                "samples": self.sample_count,
+                "top_stacks": [
+                    {"stack": stack, "samples": count} for stack, count in self.samples.most_common(TOP_STACKS)
+                ],
+            },
+            "sql": {
+                "count": len(self.statements),
+                "total_ms": round(sum(s["duration_ms"] for s in self.statements), 3),
+                "statements": self.statements,
+            },
+        }
+
+
+class ProfileStore:
+    """Últimos PROFILE_STORE_SIZE perfiles, para descargarlos después."""
+
+    def __init__(self, size: int = PROFILE_STORE_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._reports = collections.OrderedDict()
+
+    def put(self, report: dict):
+        with self._lock:
+            self._reports[report["id"]] = report
+            while len(self._reports) > self.size:
+                self._reports.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._reports.get(profile_id)
+
+
+profile_store = ProfileStore()
+
+
+def is_authorized(token: Optional[str]) -> bool:
+    return bool(PROFILING_TOKEN) and token is not None and hmac.compare_digest(token, PROFILING_TOKEN)
+
+
+def require_profiling_token(token: Optional[str]):
+    if not is_authorized(token):
+        raise HTTPException(status_code=403, detail="Profiling is disabled or the token is invalid.")
+
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI: perfila el request si trae X-Profile: 1 (o ?profile=1)
+    junto con un X-Profile-Token válido.
+
+    El id del perfil vuelve en la cabecera X-Profile-Id y el reporte se
+    descarga de /debug/profiles/{id}. Sin el flag el costo es revisar las
+    cabeceras.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not PROFILING_TOKEN:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        requested = headers.get(b"x-profile") == b"1" or b"profile=1" in scope.get("query_string", b"").split(b"&")
+        if not requested or not is_authorized(headers.get(b"x-profile-token", b"").decode("latin-1")):
+            return await self.app(scope, receive, send)
+
+        # El thread del event loop no se muestrea: atiende a todos los requests
+        session = ProfileSession(scope["method"], scope["path"])
+        status = {}
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", session.id.encode())]}
+            await send(message)
+
+        token = _active.set(session)
+        session.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            _active.reset(token)
+            # stop() hace join del sampler: fuera del event loop
+            await asyncio.to_thread(_finish, session, status.get("code"))
+
+
+def _finish(session: ProfileSession, status_code: Optional[int]):
+    session.stop(status_code)
+    profile_store.put(session.report())
+
+
+def profiled(fn):
+    """
+    Registra en el perfil activo el thread del threadpool que ejecuta un
+    endpoint sync, solo mientras lo ejecuta (después atiende otros requests).
+
+    Los endpoints async corren en el thread del event loop, compartido por
+    todos los requests, así que no se muestrean; su SQL sí se registra.
+    """
+    if inspect.iscoroutinefunction(fn):
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        session = _active.get()
+        if session is None:
+            return fn(*args, **kwargs)
+        thread_id = threading.get_ident()
+        session.add_thread(thread_id)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            session.remove_thread(thread_id)
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """Route class que envuelve cada endpoint con profiled."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, profiled(endpoint), **kwargs)
+
+
+def _count_rows(entry: dict, n: int):
+    # El rowcount empieza en -1 (desconocido, como en DBAPI) y pasa a contar
+    # con la primera lectura, aunque venga vacía
+    entry["rowcount"] = max(entry["rowcount"], 0) + n
+
+
+class _CountingCursor:
+    """
+    Proxy del cursor DBAPI que cuenta las filas leídas de un SELECT.
+
+    sqlite3 y pyodbc reportan rowcount -1 para los SELECT, así que para ellos
+    el perfil registra las filas efectivamente leídas.
+    """
+
+    def __init__(self, cursor, entry: dict):
+        self._cursor = cursor
+        self._entry = entry
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        _count_rows(self._entry, 0)
+        for row in self._cursor:
+            _count_rows(self._entry, 1)
+            yield row
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        _count_rows(self._entry, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        _count_rows(self._entry, len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        _count_rows(self._entry, len(rows))
+        return rows
+
+
+# Trazado de SQL para todos los engines (primario y réplicas); sin perfil
+# activo cada sentencia solo paga la lectura del ContextVar.
+#
+# Contar las filas de SELECT / RETURNING usa detalles internos del execution
+# context de SQLAlchemy 2.0-2.1 (context.cursor y fetchall_for_returning), por
+# eso requirements.txt fija ese rango. Si esos detalles no están, la sentencia
+# queda registrada igual con el rowcount del driver (-1 si no lo informa)
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active.get() is not None:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    session = _active.get()
+    starts = conn.info.get("profile_query_start")
+    if session is None or not starts:
+        return
+    duration_ms = (time.perf_counter() - starts.pop()) * 1000
+    if cursor.description is None or context is None:
+        # DML: rowcount son las filas afectadas
+        session.record_statement(statement, duration_ms, cursor.rowcount, executemany)
+    elif context.execute_style is ExecuteStyle.INSERTMANYVALUES:
+        # INSERT ... RETURNING por lotes: SQLAlchemy lee cada lote del cursor
+        # con fetchall_for_returning antes de ejecutar el siguiente
+        fetch = getattr(type(context), "fetchall_for_returning", None)
+        if fetch is None:
+            session.record_statement(statement, duration_ms, cursor.rowcount, executemany)
+            return
+        entry = session.record_statement(statement, duration_ms, -1, executemany)
+
+        def counted(cursor):
+            rows = fetch(context, cursor)
+            _count_rows(entry, len(rows))
+            return rows
+        context.fetchall_for_returning = counted
+    else:
+        # SELECT: el resultado lee del proxy, que va sumando las filas
+        if getattr(context, "cursor", None) is not cursor:
+            session.record_statement(statement, duration_ms, cursor.rowcount, executemany)
+            return
+        entry = session.record_statement(statement, duration_ms, -1, executemany)
+        context.cursor = _CountingCursor(cursor, entry)
@@ -0,0 +1,281 @@
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+import os
+
+from fastapi import HTTPException
+from sqlalchemy import and_, bindparam, case, extract, func, or_, select
+from sqlalchemy.orm import Session
+from sqlalchemy.util import LRUCache
+
+from app import models
+from app.analytics import snapshot
+from app.archive import hired_source, partition_catalog, quarter_of, year_window
+from app.pagination import decode_cursor, paginate
+
+# Tamaño de los caches de sentencias (forma de la consulta -> Select / Compiled)
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "128"))
+
+# Las expresiones se arman sobre el origen t (hired_employees o el UNION ALL
+# de las particiones que tocan al reporte, ver app.archive.hired_source)
+
+# Dimensiones de agrupación: nombre -> (expresión, tabla a unir o None)
+DIMENSIONS = {
+    "department_id": (lambda t: t.c.department_id, None),
+    "department": (lambda t: models.Department.department, "departments"),
+    "job_id": (lambda t: t.c.job_id, None),
+    "job": (lambda t: models.Job.job, "jobs"),
+    "year": (lambda t: extract("year", t.c.datetime), None),
+    "quarter": (lambda t: quarter_of(t.c.datetime), None),
+    "month": (lambda t: extract("month", t.c.datetime), None),
+}
+
+# Medidas: "hired" cuenta contrataciones, Q1..Q4 pivotean el conteo por trimestre
+MEASURES = {
+    "hired": lambda t: func.count(t.c.id),
+    **{
+        f"Q{q}": (lambda t, q=q: func.sum(case((quarter_of(t.c.datetime) == q, 1), else_=0)))
+        for q in range(1, 5)
+    },
+}
+
+# Filtros: nombre -> función que arma la condición con bindparams (prefijo para el baseline)
+FILTERS = {
+    # El año se filtra por rango de fechas para que el índice sobre datetime sirva
+    "year": lambda t, p: and_(
+        t.c.datetime >= bindparam(f"{p}year_start"),
+        t.c.datetime < bindparam(f"{p}year_end"),
+    ),
+    "quarter": lambda t, p: quarter_of(t.c.datetime) == bindparam(f"{p}quarter"),
+    "month": lambda t, p: extract("month", t.c.datetime) == bindparam(f"{p}month"),
+    "department_id": lambda t, p: t.c.department_id == bindparam(f"{p}department_id"),
+    "job_id": lambda t, p: t.c.job_id == bindparam(f"{p}job_id"),
+    "date_from": lambda t, p: t.c.datetime >= bindparam(f"{p}date_from"),
+    "date_to": lambda t, p: t.c.datetime < bindparam(f"{p}date_to"),
+}
+
+ORDERS = ("dimensions", "hired_desc")
+
+# Tipo de cada columna de orden, para validar los cursores keyset
+KEY_TYPES = {**{name: int for name in DIMENSIONS}, "department": str, "job": str, "hired": int}
+
+# Sentencias compiladas, compartido por todas las ejecuciones de reportes
+compiled_cache = LRUCache(REPORT_CACHE_SIZE)
+
+
+class ReportShape(NamedTuple):
+    """Forma de un reporte: todo lo que cambia el SQL (no los valores de los parámetros)."""
+    dimensions: Tuple[str, ...]
+    measures: Tuple[str, ...]
+    filters: Tuple[str, ...]
+    order: str = "dimensions"
+    above_average: bool = False
+    has_cursor: bool = False
+    partitions: Tuple[int, ...] = ()
+    include_live: bool = True
+
+
+class ReportPreset(NamedTuple):
+    """Reporte predefinido servido por el motor genérico."""
+    dimensions: Tuple[str, ...]
+    measures: Tuple[str, ...]
+    filters: dict
+    order: str = "dimensions"
+    above_average_year: Optional[int] = None
+    rename: dict = {}
+
+
+PRESETS = {
+    "hirings-per-quarter": ReportPreset(
+        dimensions=("department", "job"),
+        measures=("Q1", "Q2", "Q3", "Q4"),
+        filters={"year": 2021},
+    ),
+    "above-average-hirings-2021": ReportPreset(
+        dimensions=("department_id", "department"),
+        measures=("hired",),
+        filters={"year": 2021},
+        order="hired_desc",
+        above_average_year=2021,
+        rename={"department_id": "id"},
+    ),
+    "above-average-hirings-all": ReportPreset(
+        dimensions=("department_id", "department"),
+        measures=("hired",),
+        filters={},
+        order="hired_desc",
+        above_average_year=2021,
+        rename={"hired": "total_hired"},
+    ),
+}
+
+
+def order_keys(shape: ReportShape) -> list:
+    """Columnas (nombre, descendente) que definen el orden y el cursor keyset del reporte."""
+    keys = [(d, False) for d in shape.dimensions]
+    if shape.order == "hired_desc":
+        keys.insert(0, ("hired", True))
+    return keys
+
+
+def _apply_joins(stmt, t, names):
+    tables = {DIMENSIONS[n][1] for n in names if n in DIMENSIONS}
+    if "departments" in tables:
+        stmt = stmt.join(models.Department, t.c.department_id == models.Department.id)
+    if "jobs" in tables:
+        stmt = stmt.join(models.Job, t.c.job_id == models.Job.id)
+    return stmt
+
+
+@lru_cache(maxsize=REPORT_CACHE_SIZE)
+def build_statement(shape: ReportShape):
+    """
+    Construye el SELECT agregado para una forma de reporte.
+
+    Todos los valores van como bindparams, así que la sentencia (y su versión
+    compilada en compiled_cache) se reutiliza entre llamadas con la misma forma.
+    """
+    t = hired_source(shape.partitions, shape.include_live)
+    dims = [DIMENSIONS[d][0](t) for d in shape.dimensions]
+    hired = MEASURES["hired"](t)
+    columns = [expr.label(name) for name, expr in zip(shape.dimensions, dims)]
+    columns += [MEASURES[m](t).label(m) for m in shape.measures]
+
+    stmt = _apply_joins(select(*columns).select_from(t), t, shape.dimensions)
+    for name in shape.filters:
+        stmt = stmt.where(FILTERS[name](t, ""))
+    stmt = stmt.group_by(*dims)
+
+    # Solo grupos por encima del promedio por grupo del año baseline
+    if shape.above_average:
+        baseline = _apply_joins(
+            select(hired.label("hired")).select_from(t), t, shape.dimensions
+        ).where(FILTERS["year"](t, "baseline_")).group_by(*dims).subquery()
+        avg = select(func.avg(baseline.c.hired * 1.0)).scalar_subquery()
+        stmt = stmt.having(hired > avg)
+
+    exprs = {name: expr for name, expr in zip(shape.dimensions, dims)}
+    exprs["hired"] = hired
+    keys = order_keys(shape)
+
+    # Keyset: (k0 > c0) OR (k0 = c0 AND k1 > c1) OR ... (con < en las columnas descendentes)
+    if shape.has_cursor:
+        branches = []
+        for i, (name, desc) in enumerate(keys):
+            expr = exprs[name]
+            after = bindparam(f"after_{name}")
+            step = expr < after if desc else expr > after
+            prefix = [exprs[n] == bindparam(f"after_{n}") for n, _ in keys[:i]]
+            branches.append(and_(*prefix, step))
+        stmt = stmt.having(or_(*branches))
+
+    return stmt.order_by(*[exprs[n].desc() if desc else exprs[n] for n, desc in keys])
+
+
+def _year_range(prefix: str, year: int) -> dict:
+    start, end = year_window(year)
+    return {f"{prefix}year_start": start, f"{prefix}year_end": end}
+
+
+def run_report(
+    db: Session,
+    dimensions,
+    measures,
+    filters: dict,
+    order: str = "dimensions",
+    above_average_year: Optional[int] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    rename: Optional[dict] = None,
+    data_version: Optional[int] = None,
+) -> dict:
+    """
+    Ejecuta un reporte de contrataciones agrupado por las dimensiones pedidas.
+
+    Parámetros:
+    - db: Sesión de lectura
+    - dimensions: Dimensiones de agrupación (department, job, year, quarter, month, *_id)
+    - measures: Medidas (hired, Q1..Q4)
+    - filters: Filtros con valor (year, quarter, month, department_id, job_id, date_from, date_to)
+    - order: "dimensions" u "hired_desc"
+    - above_average_year: Si se indica, solo grupos sobre el promedio de ese año
+    - limit / cursor: Paginación keyset
+    - rename: Renombrado de columnas en la respuesta (para los presets)
+    - data_version: Versión de datos leída en esta sesión; el snapshot de
+      analytics solo responde si cargó exactamente esa versión
+
+    Retorna:
+    - {"items": [...], "next_cursor": ...}
+    """
+    filters = {k: v for k, v in filters.items() if v is not None}
+    unknown = (set(dimensions) - set(DIMENSIONS)) | (set(measures) - set(MEASURES)) | (set(filters) - set(FILTERS))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown report fields: {', '.join(sorted(unknown))}")
+    if not dimensions or not measures:
+        raise HTTPException(status_code=400, detail="At least one dimension and one measure are required.")
+    if order not in ORDERS:
+        raise HTTPException(status_code=400, detail=f"order must be one of: {', '.join(ORDERS)}")
+    if (order == "hired_desc" or above_average_year is not None) and "hired" not in measures:
+        raise HTTPException(status_code=400, detail="Ordering or filtering by hires requires the 'hired' measure.")
+
+    shape = ReportShape(
+        dimensions=tuple(dict.fromkeys(dimensions)),
+        measures=tuple(dict.fromkeys(measures)),
+        filters=tuple(sorted(filters)),
+        order=order,
+        above_average=above_average_year is not None,
+        has_cursor=bool(cursor),
+    )
+    keys = [name for name, _ in order_keys(shape)]
+
+    params = {k: v for k, v in filters.items() if k != "year"}
+    if "year" in filters:
+        params.update(_year_range("", filters["year"]))
+    if above_average_year is not None:
+        params.update(_year_range("baseline_", above_average_year))
+    after = decode_cursor(cursor, {k: KEY_TYPES[k] for k in keys}) if cursor else None
+    if after:
+        params.update({f"after_{k}": v for k, v in after.items()})
+
+    page = None
+    if snapshot.enabled:
+        if snapshot.is_fresh(data_version):
+            page = snapshot.run_report(shape, filters, above_average_year, order_keys(shape), limit, after)
+        else:
+            snapshot.refresh_async(db.get_bind())
+
+    if page is None:
+        # Poda de particiones: solo las tablas de los años que cubren los filtros
+        if "year" in filters:
+            windows = [year_window(filters["year"])]
+        else:
+            windows = [(filters.get("date_from"), filters.get("date_to"))]
+        if above_average_year is not None:
+            windows.append(year_window(above_average_year))
+        partitions, include_live = partition_catalog.prune(db, windows)
+        shape = shape._replace(partitions=partitions, include_live=include_live)
+
+        stmt = build_statement(shape).limit(limit + 1)
+        result = db.execute(stmt, params, execution_options={"compiled_cache": compiled_cache})
+        page = paginate([dict(r._mapping) for r in result], limit, keys)
+
+    if rename:
+        page["items"] = [{rename.get(k, k): v for k, v in row.items()} for row in page["items"]]
+    return page
+
+
+def run_preset(db: Session, name: str, limit: int = 100, cursor: Optional[str] = None,
+               data_version: Optional[int] = None) -> dict:
+    """Ejecuta uno de los reportes predefinidos (PRESETS) con el motor genérico."""
+    preset = PRESETS[name]
+    return run_report(
+        db,
+        preset.dimensions,
+        preset.measures,
+        preset.filters,
+        order=preset.order,
+        above_average_year=preset.above_average_year,
+        limit=limit,
+        cursor=cursor,
+        rename=preset.rename,
+        data_version=data_version,
+    )
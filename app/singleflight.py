@@ -0,0 +1,167 @@
+import asyncio
+import functools
+import inspect
+import threading
+
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+
+# Parámetros que no forman parte de la clave (cambian en cada request)
+_EXCLUDED_TYPES = (Session, Request, Response)
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _LeaderCancelled(Exception):
+    """El líder de un flight async se canceló: sus seguidores deben reintentar."""
+
+
+class SingleFlight:
+    """
+    Coalescencia de llamadas concurrentes idénticas ("single-flight").
+
+    Mientras una llamada con cierta clave está en curso, las demás con la
+    misma clave esperan y reciben su resultado (o su excepción) en vez de
+    ejecutar de nuevo. No es un cache: al terminar, la clave se libera.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = {}
+        self._requests = 0
+        self._executions = 0
+
+    def do(self, key, fn):
+        """Versión síncrona: los seguidores bloquean su thread hasta que termine el líder."""
+        with self._lock:
+            self._requests += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._executions += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    async def do_async(self, key, fn):
+        """
+        Versión async: fn es una corrutina; los seguidores esperan el mismo future.
+
+        Si el líder se cancela (el cliente se fue), los seguidores no heredan
+        la cancelación: vuelven a intentar y uno de ellos pasa a ser el líder.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._requests += 1
+
+        while True:
+            with self._lock:
+                future = self._async_calls.get((loop, key))
+                leader = future is None
+                if leader:
+                    future = self._async_calls[(loop, key)] = loop.create_future()
+                    self._executions += 1
+
+            if not leader:
+                try:
+                    return await asyncio.shield(future)
+                except _LeaderCancelled:
+                    continue
+
+            try:
+                result = await fn()
+                future.set_result(result)
+                return result
+            except asyncio.CancelledError:
+                future.set_exception(_LeaderCancelled())
+                future.exception()
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                # Evita el warning de "exception never retrieved" si no hubo seguidores
+                future.exception()
+                raise
+            finally:
+                with self._lock:
+                    del self._async_calls[(loop, key)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            coalesced = self._requests - self._executions
+            return {
+                "requests": self._requests,
+                "executions": self._executions,
+                "coalesced": coalesced,
+                "coalescing_ratio": round(coalesced / self._requests, 4) if self._requests else 0.0,
+                "in_flight": len(self._calls) + len(self._async_calls),
+            }
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+report_flight = SingleFlight()
+
+
+def coalesce(name: str, flight: SingleFlight = report_flight):
+    """
+    Decorador para endpoints o funciones que llaman: llamadas concurrentes con
+    el mismo nombre y los mismos parámetros comparten una sola ejecución.
+
+    Sesiones, Request y Response se excluyen de la clave. Funciona con
+    funciones sync (que FastAPI corre en el threadpool) y async.
+
+    Las dependencias del endpoint se resuelven antes de entrar al flight, así
+    que la función no debería recibir la sesión por Depends: abrirla dentro
+    del cuerpo hace que solo el líder tome una conexión del pool. Lo que
+    distinga a un resultado válido (como la versión de datos vista) tiene que
+    ser un parámetro para que entre en la clave.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        def key_for(args, kwargs):
+            bound = signature.bind(*args, **kwargs)
+            return (name,) + tuple(sorted(
+                (k, _freeze(v)) for k, v in bound.arguments.items()
+                if not isinstance(v, _EXCLUDED_TYPES)
+            ))
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                return await flight.do_async(key_for(args, kwargs), lambda: fn(*args, **kwargs))
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return flight.do(key_for(args, kwargs), lambda: fn(*args, **kwargs))
+        return wrapper
+
+    return decorator
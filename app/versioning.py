@@ -0,0 +1,134 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, NamedTuple, Optional
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import models
+
+
+def ensure_data_version(db: Session):
+    """
+    Crea la fila única de data_version (versión 0) si todavía no existe.
+
+    Se llama una vez al arrancar, después de create_all, para que
+    bump_data_version sea siempre un UPDATE simple. Si otro worker la crea al
+    mismo tiempo el IntegrityError se ignora.
+    """
+    if db.get(models.DataVersion, 1) is not None:
+        return
+    db.add(models.DataVersion(id=1, version=0))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+
+
+def bump_data_version(db: Session) -> int:
+    """
+    Incrementa la versión de datos dentro de la transacción de la ingesta.
+
+    Debe llamarse antes del commit para que la versión y los datos se
+    confirmen juntos. La fila la crea ensure_data_version al arrancar.
+
+    Retorna:
+    - La nueva versión (la que quedará confirmada con el commit)
+    """
+    db.execute(
+        update(models.DataVersion)
+        .where(models.DataVersion.id == 1)
+        .values(version=models.DataVersion.version + 1, updated_at=datetime.now(timezone.utc))
+    )
+    return current_data_version(db)[0]
+
+
+def current_data_version(db: Session):
+    """Retorna (version, updated_at) o (0, None) si todavía no hubo ingestas."""
+    row = db.execute(
+        select(models.DataVersion.version, models.DataVersion.updated_at).where(models.DataVersion.id == 1)
+    ).first()
+    return (row.version, row.updated_at) if row else (0, None)
+
+
+def _http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # Comparación débil: se ignora el prefijo W/
+    candidates = [c.strip() for c in header.split(",")]
+    return "*" in candidates or any(c.removeprefix("W/") == etag.removeprefix("W/") for c in candidates)
+
+
+class VersionedPage(NamedTuple):
+    """Página de un reporte junto con la versión de datos con la que se calculó."""
+    version: int
+    updated_at: Optional[datetime]
+    page: dict
+
+
+def run_versioned(db: Session, run: Callable[[int], dict]) -> VersionedPage:
+    """
+    Lee la versión de datos y ejecuta el reporte en la misma sesión.
+
+    La versión se lee antes que los datos: como cada escritura confirma datos
+    y versión juntos, lo que lea el reporte es al menos tan nuevo como esa
+    versión. Etiquetar con una versión vieja solo cuesta un 200 de más;
+    etiquetar con una nueva haría que un 304 valide datos viejos.
+    """
+    version, updated_at = current_data_version(db)
+    return VersionedPage(version, updated_at, run(version))
+
+
+def _validators(request: Request, version: int, updated_at: Optional[datetime]) -> dict:
+    # El ETag combina la versión de datos con la URL pedida
+    url = f"{request.url.path}?{request.url.query}"
+    url_hash = hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+    headers = {"ETag": f'W/"{version}-{url_hash}"', "Cache-Control": "no-cache"}
+    if updated_at is not None:
+        headers["Last-Modified"] = _http_date(updated_at)
+    return headers
+
+
+def check_not_modified(request: Request, db: Session) -> int:
+    """
+    Validación condicional de un reporte (ETag / Last-Modified).
+
+    Si el cliente ya tiene la versión actual (If-None-Match, o
+    If-Modified-Since sin If-None-Match) se corta con 304 antes de ejecutar
+    el reporte. Los validadores de un 200 no salen de aquí sino de
+    set_validators, con la versión que leyó el propio reporte.
+
+    Retorna:
+    - La versión vista, para la clave de coalescencia del reporte
+    """
+    version, updated_at = current_data_version(db)
+    headers = _validators(request, version, updated_at)
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, headers["ETag"])
+    elif if_modified_since and updated_at is not None:
+        try:
+            not_modified = parsedate_to_datetime(if_modified_since) >= parsedate_to_datetime(headers["Last-Modified"])
+        except (TypeError, ValueError):
+            not_modified = False
+    else:
+        not_modified = False
+
+    if not_modified:
+        raise HTTPException(status_code=304, headers=headers)
+    return version
+
+
+def set_validators(request: Request, response: Response, served: VersionedPage) -> dict:
+    """Pone ETag / Last-Modified de la versión con la que se calculó el reporte y retorna la página."""
+    response.headers.update(_validators(request, served.version, served.updated_at))
+    return served.page
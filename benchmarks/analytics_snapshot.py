@@ -0,0 +1,76 @@
+"""
+Benchmark del snapshot de analytics (app/analytics.py).
+
+Genera N filas sintéticas de hired_employees, las carga en un HiringSnapshot
+y mide memoria y latencia de los presets de reportes sin base de datos.
+
+Uso:
+python -m benchmarks.analytics_snapshot --rows 1000000 --repeat 20
+"""
+import argparse
+import os
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+
+# El benchmark no toca la base, pero importar app.db crea el engine
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.analytics import HiringSnapshot, to_snapshot_frame
+from app.reports import PRESETS, ReportShape, order_keys
+
+
+def synthetic_rows(rows: int, departments: int, jobs: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    start = np.datetime64("2019-01-01T00:00:00")
+    seconds = rng.integers(0, 4 * 365 * 24 * 3600, size=rows)
+    return pd.DataFrame({
+        "id": np.arange(1, rows + 1),
+        "datetime": start + seconds.astype("timedelta64[s]"),
+        "department_id": rng.integers(1, departments + 1, size=rows),
+        "job_id": rng.integers(1, jobs + 1, size=rows),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--departments", type=int, default=12)
+    parser.add_argument("--jobs", type=int, default=180)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    snapshot = HiringSnapshot(enabled=True, max_age=float("inf"))
+    frame = to_snapshot_frame(synthetic_rows(args.rows, args.departments, args.jobs))
+    snapshot.replace(
+        frame,
+        {i: f"Department {i}" for i in range(1, args.departments + 1)},
+        {i: f"Job {i}" for i in range(1, args.jobs + 1)},
+        data_version=0,
+    )
+
+    memory = snapshot.memory_usage()
+    print(f"rows: {args.rows:,}")
+    print(f"memory: {memory / 2**20:.1f} MiB ({memory / args.rows:.1f} bytes/row, "
+          f"{memory / 2**20 / args.rows * 1e6:.1f} MiB per million rows)")
+
+    for name, preset in PRESETS.items():
+        shape = ReportShape(
+            dimensions=preset.dimensions,
+            measures=preset.measures,
+            filters=tuple(sorted(preset.filters)),
+            order=preset.order,
+            above_average=preset.above_average_year is not None,
+        )
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            snapshot.run_report(shape, preset.filters, preset.above_average_year, order_keys(shape), 100, None)
+            timings.append((time.perf_counter() - started) * 1000)
+        print(f"{name}: median {statistics.median(timings):.2f} ms, min {min(timings):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
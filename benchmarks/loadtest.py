@@ -0,0 +1,218 @@
+"""
+Prueba de carga en proceso: mezcla de cargas de CSV y lecturas de reportes.
+
+Levanta la app de FastAPI sobre una base SQLite temporal y la ejercita con
+httpx a través del transporte ASGI (sin red ni servidor). Las llegadas son
+de lazo abierto a la tasa pedida; si hay más de --max-in-flight requests en
+curso la llegada se descarta y se cuenta como "dropped".
+
+Reporta por escenario: requests, throughput, p50/p95/p99, errores (5xx,
+excepción o 200 con {"error": ...}) y rechazos de admisión (429/503).
+
+Uso:
+python -m benchmarks.loadtest --rate 50 --duration 30 --mix report-quarter:6,report-hirings:2,upload-hired:1
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SAMPLE_DIRS = [ROOT / "sample", ROOT / "sample2"]
+
+# Escenarios: nombre -> (método, ruta, tabla a subir o None, query params)
+SCENARIOS = {
+    "upload-departments": ("POST", "/upload-csv-df-sql/departments", "departments", None),
+    "upload-jobs": ("POST", "/upload-csv-df-sql/jobs", "jobs", None),
+    "upload-hired": ("POST", "/upload-csv-df-sql/hired_employees", "hired_employees", None),
+    "upload-hired-inlist": ("POST", "/upload-csvs-sql/hired_employees", "hired_employees", None),
+    "upload-hired-auto": ("POST", "/upload/hired_employees", "hired_employees", None),
+    "report-quarter": ("GET", "/report/hirings-per-quarter", None, None),
+    "report-above-2021": ("GET", "/report/above-average-hirings-2021", None, None),
+    "report-above-all": ("GET", "/report/above-average-hirings-all", None, None),
+    "report-hirings": ("GET", "/report/hirings", None, {"dimensions": ["department", "quarter"], "year": 2021}),
+}
+
+DEFAULT_MIX = "report-quarter:5,report-above-2021:1,report-above-all:1,report-hirings:2,upload-hired:1"
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition(":")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario '{name}' (options: {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(values: list, pct: float) -> float:
+    # Nearest-rank sobre la lista ordenada
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+        self.dropped = defaultdict(int)
+
+    def record(self, name: str, latency_ms: float, status, failed: bool = False):
+        self.latencies[name].append(latency_ms)
+        self.statuses[name][status] += 1
+        if failed or status == "exception" or (isinstance(status, int) and status >= 500 and status != 503):
+            self.errors[name] += 1
+
+    def summary(self, elapsed: float) -> dict:
+        result = {}
+        for name in sorted(set(self.latencies) | set(self.dropped)):
+            latencies = self.latencies[name]
+            count = len(latencies)
+            rejected = self.statuses[name].get(429, 0) + self.statuses[name].get(503, 0)
+            result[name] = {
+                "requests": count,
+                "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+                "p50_ms": round(percentile(latencies, 50), 2),
+                "p95_ms": round(percentile(latencies, 95), 2),
+                "p99_ms": round(percentile(latencies, 99), 2),
+                "error_rate": round(self.errors[name] / count, 4) if count else 0.0,
+                "rejected_rate": round(rejected / count, 4) if count else 0.0,
+                "dropped": self.dropped[name],
+                "statuses": {str(k): v for k, v in self.statuses[name].items()},
+            }
+        return result
+
+
+def load_payloads() -> dict:
+    payloads = defaultdict(list)
+    for directory in SAMPLE_DIRS:
+        for table in ("departments", "jobs", "hired_employees"):
+            path = directory / f"{table}.csv"
+            if path.exists():
+                payloads[table].append((path.name, path.read_bytes()))
+    return payloads
+
+
+def reported_error(response) -> bool:
+    # La ingesta responde 200 con {"error": ...} cuando la carga falla
+    if response.status_code != 200:
+        return False
+    try:
+        body = response.json()
+    except ValueError:
+        return False
+    return isinstance(body, dict) and "error" in body
+
+
+async def send(client, scenario: str, payloads: dict):
+    method, path, table, params = SCENARIOS[scenario]
+    if table is None:
+        return await client.request(method, path, params=params)
+    filename, content = random.choice(payloads[table])
+    return await client.request(method, path, params=params, files={"file": (filename, content, "text/csv")})
+
+
+async def run(args) -> dict:
+    # Importar la app recién después de fijar DATABASE_URL
+    from app.main import app
+    import httpx
+
+    payloads = load_payloads()
+    stats = Stats()
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+        # Datos iniciales para que los reportes tengan algo que agregar
+        for table in ("departments", "jobs", "hired_employees"):
+            for filename, content in payloads[table][:1]:
+                await client.post(f"/upload-csv-df-sql/{table}", files={"file": (filename, content, "text/csv")})
+
+        names = list(args.mix)
+        weights = list(args.mix.values())
+        in_flight = set()
+
+        async def one(scenario: str):
+            started = time.perf_counter()
+            failed = False
+            try:
+                response = await send(client, scenario, payloads)
+                status = response.status_code
+                failed = reported_error(response)
+            except Exception:
+                status = "exception"
+            stats.record(scenario, (time.perf_counter() - started) * 1000, status, failed)
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + args.duration
+        next_arrival = started
+        while next_arrival < deadline:
+            await asyncio.sleep(max(0.0, next_arrival - loop.time()))
+            scenario = random.choices(names, weights)[0]
+            if len(in_flight) >= args.max_in_flight:
+                stats.dropped[scenario] += 1
+            else:
+                task = asyncio.create_task(one(scenario))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            gap = random.expovariate(args.rate) if args.poisson else 1 / args.rate
+            next_arrival += gap
+
+        if in_flight:
+            await asyncio.wait(in_flight)
+        elapsed = loop.time() - started
+
+    return {"elapsed_s": round(elapsed, 2), "target_rps": args.rate, "routes": stats.summary(elapsed)}
+
+
+def print_table(result: dict):
+    print(f"elapsed: {result['elapsed_s']} s, target rate: {result['target_rps']} req/s")
+    header = f"{'scenario':<22}{'reqs':>7}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}{'rejected':>10}{'dropped':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, r in result["routes"].items():
+        print(
+            f"{name:<22}{r['requests']:>7}{r['throughput_rps']:>9}{r['p50_ms']:>10}{r['p95_ms']:>10}"
+            f"{r['p99_ms']:>10}{r['error_rate']:>9.2%}{r['rejected_rate']:>10.2%}{r['dropped']:>9}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rate", type=float, default=20, help="llegadas por segundo")
+    parser.add_argument("--duration", type=float, default=10, help="segundos de carga")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help="escenario:peso,...")
+    parser.add_argument("--max-in-flight", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--poisson", action="store_true", help="llegadas exponenciales en vez de uniformes")
+    parser.add_argument("--database", help="URL SQLAlchemy (default: SQLite temporal)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="guardar el resultado en este archivo")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    os.environ["DATABASE_URL"] = args.database or f"sqlite:///{os.path.join(workdir, 'loadtest.db')}"
+    os.environ.pop("DB_REPLICA_URLS", None)
+    sys.path.insert(0, str(ROOT))
+
+    result = asyncio.run(run(args))
+    print_table(result)
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# La app lee la configuración de la base al importarse: primario SQLite
+# temporal y sin réplicas, antes de que cualquier test importe app.*
+WORKDIR = Path(tempfile.mkdtemp(prefix="tests-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{WORKDIR / 'primary.db'}"
+os.environ.pop("DB_REPLICA_URLS", None)
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+SAMPLE = Path(__file__).resolve().parent.parent / "sample"
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Cliente de la app con la muestra de sample/ cargada."""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    client = TestClient(app)
+    for table in ("departments", "jobs", "hired_employees"):
+        with open(SAMPLE / f"{table}.csv", "rb") as f:
+            response = client.post(f"/upload/{table}", files={"file": (f"{table}.csv", f, "text/csv")})
+        assert "error" not in response.json()
+    return client
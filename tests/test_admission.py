@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from app.admission import AdmissionController, UploadAdmissionMiddleware, upload_admission
+
+CSV = b"1,Admission Dept\n"
+
+
+def post_upload(client):
+    return client.post("/upload/departments", files={"file": ("departments.csv", CSV, "text/csv")})
+
+
+@pytest.mark.parametrize("limits, status_code", [
+    ({"max_concurrency": 0, "queue_size": 0}, 429),
+    ({"max_concurrency": 0, "queue_size": 1, "queue_timeout": 0.05}, 503),
+])
+def test_upload_without_slot_is_rejected_with_retry_after(client, monkeypatch, limits, status_code):
+    for name, value in limits.items():
+        monkeypatch.setattr(upload_admission, name, value)
+    response = post_upload(client)
+    assert response.status_code == status_code
+    assert "Retry-After" in response.headers
+
+
+def test_upload_over_memory_budget_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(upload_admission, "memory_budget", 100)
+    response = post_upload(client)
+    assert response.status_code == 413
+    assert "Retry-After" not in response.headers
+
+
+def test_admitted_uploads_release_their_slot(client):
+    assert post_upload(client).status_code == 200
+    assert client.post("/upload/bogus", files={"file": ("x.csv", CSV, "text/csv")}).status_code == 400
+    assert upload_admission.stats()["per_table"] == {}
+    assert upload_admission.stats()["active"] == 0
+
+
+def test_admission_runs_before_the_body_is_read():
+    async def app(scope, receive, send):
+        raise AssertionError("la app no debería ejecutarse")
+
+    async def receive():
+        raise AssertionError("el cuerpo no debería leerse")
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    middleware = UploadAdmissionMiddleware(app, tables={"jobs"}, controller=AdmissionController(memory_budget=2**20))
+    scope = {"type": "http", "method": "POST", "path": "/upload-csv/jobs", "headers": [(b"content-length", b"1000000")]}
+    asyncio.run(middleware(scope, receive, send))
+    assert sent[0]["status"] == 413
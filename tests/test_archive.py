@@ -0,0 +1,79 @@
+from sqlalchemy import func, select
+
+from app import models
+from app.archive import partition_catalog
+from app.db import SessionLocal
+
+# Filas tardías de 2021 con ids que no están en la muestra
+LATE_2021 = b"""90001,Late One,2021-03-01T10:00:00Z,1,1
+90002,Late Two,2021-07-15T10:00:00Z,2,2
+90003,Late Three,2022-02-01T10:00:00Z,3,3
+"""
+RACED_2021 = b"""80011,Raced One,2021-04-01T10:00:00Z,1,1
+80012,Raced Two,2021-09-01T10:00:00Z,2,2
+"""
+
+
+def upload(client, content: bytes) -> dict:
+    response = client.post("/upload/hired_employees", files={"file": ("late.csv", content, "text/csv")})
+    assert response.status_code == 200
+    assert "error" not in response.json()
+    return response.json()
+
+
+def hired_2021(client, filtered: bool) -> int:
+    params = {"dimensions": "year", "measures": "hired", "limit": 1000}
+    if filtered:
+        params["year"] = 2021
+    items = client.get("/report/hirings", params=params).json()["items"]
+    return sum(item["hired"] for item in items if item["year"] == 2021)
+
+
+def live_rows_2021() -> int:
+    live = models.HiredEmployee
+    with SessionLocal() as db:
+        return db.execute(
+            select(func.count()).select_from(live).where(func.strftime("%Y", live.datetime) == "2021")
+        ).scalar()
+
+
+def assert_consistent(client, expected: int):
+    assert hired_2021(client, filtered=True) == expected
+    assert hired_2021(client, filtered=False) == expected
+    assert live_rows_2021() == 0
+    summary = client.get("/archive/2021/summary").json()
+    assert sum(row["hired"] for row in summary) == expected
+
+
+def test_archive_flow(client, monkeypatch):
+    before = hired_2021(client, filtered=False)
+    assert before > 0
+    assert hired_2021(client, filtered=True) == before
+
+    result = client.post("/archive/2021").json()
+    assert result["rows_moved"] == before
+    assert [p["year"] for p in client.get("/archive").json()] == [2021]
+    assert_consistent(client, before)
+
+    # Carga tardía: las filas de 2021 van a hired_employees_2021, la de 2022 a la tabla viva
+    result = upload(client, LATE_2021)
+    assert result["dedup"]["partitions"] == {"archived_years": [2021], "live": True}
+    assert_consistent(client, before + 2)
+
+    # La misma carga de nuevo se deduplica contra la partición archivada
+    result = upload(client, LATE_2021)
+    assert result["duplicates_skipped"] == 3
+    assert_consistent(client, before + 2)
+
+    # /seed inserta 50 filas de 2021 por ORM
+    assert client.post("/seed").status_code == 200
+    assert_consistent(client, before + 52)
+
+    # Carga que leyó el catálogo antes de que se confirmara el archivo de 2021
+    archived = partition_catalog.archived
+    monkeypatch.setattr(
+        partition_catalog, "archived", lambda db, fresh=False: archived(db, fresh) if fresh else {}
+    )
+    upload(client, RACED_2021)
+    monkeypatch.undo()
+    assert_consistent(client, before + 54)
@@ -0,0 +1,115 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+import app.ingest
+from app import models
+from app.ingest import DEDUP_KEYS, MERGE_MAX_ROWS, STRATEGIES, plan_dedup
+
+HIRED = models.HiredEmployee.__table__
+KEYS = DEDUP_KEYS["hired_employees"]
+
+EXISTING = [
+    {"id": 1, "name": "Ana", "datetime": datetime(2021, 1, 5, 9), "department_id": 1, "job_id": 1},
+    {"id": 2, "name": "Ana", "datetime": datetime(2021, 1, 5, 9), "department_id": 1, "job_id": 1},
+    {"id": 3, "name": "Luis", "datetime": datetime(2021, 3, 1, 12), "department_id": 2, "job_id": 4},
+    {"id": 4, "name": "Marta", "datetime": datetime(2022, 7, 9, 18), "department_id": 3, "job_id": 2},
+    {"id": 5, "name": "Pablo", "datetime": datetime(2022, 8, 1, 8), "department_id": 1, "job_id": 3},
+]
+
+# (name, datetime, department_id, job_id, ya existe)
+UPLOAD = [
+    ("Ana", datetime(2021, 1, 5, 9), 1, 1, True),
+    ("Ana", datetime(2021, 1, 5, 9), 1, 1, True),
+    ("Ana", datetime(2021, 1, 5, 10), 1, 1, False),
+    ("Luis", datetime(2021, 3, 1, 12), 2, 4, True),
+    ("Luis", datetime(2021, 3, 1, 12), 2, 5, False),
+    ("Marta", datetime(2022, 7, 9, 18), 3, 2, True),
+    ("Nora", datetime(2022, 7, 9, 18), 3, 2, False),
+    ("Pablo", datetime(2022, 8, 1, 8), 1, 3, True),
+    ("Pablo", datetime(2022, 8, 1, 8), 9, 3, False),
+]
+
+
+@pytest.mark.parametrize("n, N, expected", [
+    (1_000, 0, "none"),
+    (1, 1_000_000, "row_probe"),
+    (1_000, 1_000_000, "in_list"),
+    (100_000, 1_000, "merge"),
+])
+def test_planner_picks_the_cheapest_strategy_per_regime(n, N, expected):
+    strategy, cost, estimates = plan_dedup(n, N)
+    assert strategy.name == expected
+    assert cost == min(c for c in estimates.values() if c is not None)
+
+
+def test_planner_skips_strategies_that_do_not_apply():
+    # Sin filas "none" es gratis, pero se puede descartar (tabla no vacía según la base)
+    strategy, _, _ = plan_dedup(1_000, 0, exclude=("none",))
+    assert strategy.name != "none"
+    # Con filas existentes "none" no aplica; sobre MERGE_MAX_ROWS tampoco "merge"
+    _, _, estimates = plan_dedup(100_000, MERGE_MAX_ROWS + 1)
+    assert estimates["none"] is None
+    assert estimates["merge"] is None
+    assert plan_dedup(100_000, MERGE_MAX_ROWS + 1)[0].name not in ("none", "merge")
+
+
+def test_planner_honours_and_validates_forced_strategies():
+    for name in STRATEGIES:
+        assert plan_dedup(10, 1_000_000, forced=name)[0].name == name
+    with pytest.raises(HTTPException) as exc:
+        plan_dedup(10, 10, forced="bogus")
+    assert exc.value.status_code == 400
+
+
+@pytest.fixture
+def db(monkeypatch):
+    # Bloques chicos para pasar por más de una consulta IN y más de un chunk
+    monkeypatch.setattr(app.ingest, "IN_LIST_CHUNK", 2)
+    monkeypatch.setattr(app.ingest, "MERGE_CHUNKSIZE", 2)
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    HIRED.create(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def upload_frame() -> pd.DataFrame:
+    df = pd.DataFrame([row[:4] for row in UPLOAD], columns=KEYS)
+    df["datetime"] = df["datetime"].astype("datetime64[ns]")
+    return df
+
+
+@pytest.mark.parametrize("name", [name for name in STRATEGIES if name != "none"])
+def test_strategies_mark_the_same_duplicates(db, name):
+    # Confirmadas: las estrategias que leen con pandas usan su propia conexión (db.bind)
+    db.execute(insert(HIRED), EXISTING)
+    db.commit()
+    mask = STRATEGIES[name].existing_mask(db, HIRED, KEYS, upload_frame())
+    assert mask.tolist() == [row[4] for row in UPLOAD]
+
+
+@pytest.mark.parametrize("name", list(STRATEGIES))
+def test_strategies_agree_on_an_empty_table(db, name):
+    mask = STRATEGIES[name].existing_mask(db, HIRED, KEYS, upload_frame())
+    assert not mask.any()
+    assert len(mask) == len(UPLOAD)
+
+
+def test_unknown_strategy_is_rejected_before_reading_the_upload(client, monkeypatch):
+    def read_upload(*args, **kwargs):
+        raise AssertionError("la carga no debería leerse")
+
+    monkeypatch.setattr(app.ingest, "read_upload", read_upload)
+    response = client.post(
+        "/upload/hired_employees",
+        params={"strategy": "bogus"},
+        files={"file": ("hired.csv", b"1,X,2021-01-01T00:00:00Z,1,1\n", "text/csv")},
+    )
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Unknown dedup strategy: bogus"}
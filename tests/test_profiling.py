@@ -0,0 +1,86 @@
+import pytest
+
+import app.profiling
+from app.analytics import snapshot
+
+TOKEN = "test-token"
+PROFILE = {"X-Profile": "1", "X-Profile-Token": TOKEN}
+
+DEPARTMENTS = b"""5001,Profiled One
+5002,Profiled Two
+"""
+
+
+@pytest.fixture
+def profiling(monkeypatch):
+    monkeypatch.setattr(app.profiling, "PROFILING_TOKEN", TOKEN)
+
+
+def profile_of(client, response) -> dict:
+    report = client.get(f"/debug/profiles/{response.headers['X-Profile-Id']}", headers={"X-Profile-Token": TOKEN})
+    assert report.status_code == 200
+    return report.json()
+
+
+def statements(report: dict, fragment: str) -> list:
+    return [s for s in report["sql"]["statements"] if fragment in s["statement"]]
+
+
+@pytest.mark.parametrize("headers", [
+    {"X-Profile": "1"},
+    {"X-Profile": "1", "X-Profile-Token": "wrong"},
+    {"X-Profile-Token": TOKEN},
+])
+def test_request_without_flag_and_valid_token_is_not_profiled(client, profiling, headers):
+    response = client.get("/report/hirings-per-quarter", headers=headers)
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+
+
+def test_profiling_is_disabled_without_configured_token(client):
+    response = client.get("/report/hirings-per-quarter", headers=PROFILE)
+    assert "X-Profile-Id" not in response.headers
+    assert client.get("/debug/profiles/x", headers={"X-Profile-Token": ""}).status_code == 403
+
+
+def test_profile_download_requires_the_token(client, profiling):
+    response = client.get("/report/hirings-per-quarter", headers=PROFILE)
+    profile_id = response.headers["X-Profile-Id"]
+    assert client.get(f"/debug/profiles/{profile_id}").status_code == 403
+    assert client.get(f"/debug/profiles/{profile_id}", headers={"X-Profile-Token": "wrong"}).status_code == 403
+    assert client.get("/debug/profiles/missing", headers={"X-Profile-Token": TOKEN}).status_code == 404
+
+
+def test_report_profile_captures_selects_with_rows_read(client, profiling, monkeypatch):
+    # Con ANALYTICS_SNAPSHOT=1 el reporte saldría de memoria, sin SELECT
+    monkeypatch.setattr(snapshot, "enabled", False)
+    response = client.get("/report/hirings-per-quarter", params={"limit": 5}, headers=PROFILE)
+    assert response.status_code == 200
+    report = profile_of(client, response)
+    assert report["path"] == "/report/hirings-per-quarter"
+    assert report["status_code"] == 200
+    assert report["sql"]["count"] == len(report["sql"]["statements"]) > 0
+
+    # El reporte pide limit + 1 filas para saber si hay otra página
+    page = response.json()
+    report_rows = len(page["items"]) + (page["next_cursor"] is not None)
+    assert any(s["rowcount"] == report_rows for s in statements(report, "GROUP BY"))
+    assert all(s["rowcount"] == 1 for s in statements(report, "data_version"))
+
+
+def test_upload_profile_captures_inserted_rows(client, profiling):
+    response = client.post(
+        "/upload/departments", files={"file": ("departments.csv", DEPARTMENTS, "text/csv")}, headers=PROFILE
+    )
+    assert response.status_code == 200
+    report = profile_of(client, response)
+    inserts = statements(report, "INSERT INTO departments")
+    assert sum(s["rowcount"] for s in inserts) == 2
+
+
+def test_insert_returning_profile_counts_returned_rows(client, profiling):
+    # /seed agrega 10 departments por ORM: INSERT ... RETURNING id
+    response = client.post("/seed", headers=PROFILE)
+    assert response.status_code == 200
+    returning = [s for s in statements(profile_of(client, response), "INSERT INTO departments") if "RETURNING" in s["statement"]]
+    assert sum(s["rowcount"] for s in returning) == 10
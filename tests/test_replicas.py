@@ -0,0 +1,73 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from app.db import ReadReplicaRouter, make_engine
+
+
+def factory(path):
+    return sessionmaker(bind=make_engine(f"sqlite:///{path}"))
+
+
+def whoami(db):
+    return db.execute(text("select name from whoami")).scalar()
+
+
+@pytest.fixture
+def make_database(tmp_path):
+    """Un archivo SQLite por base, con una fila que dice cuál es."""
+    def make(name):
+        path = tmp_path / f"{name}.db"
+        with make_engine(f"sqlite:///{path}").begin() as conn:
+            conn.execute(text("create table whoami (name text)"))
+            conn.execute(text("insert into whoami values (:name)"), {"name": name})
+        return factory(path)
+    return make
+
+
+@pytest.fixture
+def down(tmp_path):
+    # Ruta en un directorio inexistente: SQLite falla al abrir la conexión
+    return factory(tmp_path / "missing" / "replica.db")
+
+
+def recover(tmp_path):
+    """Crea la base de la réplica caída: desde aquí conecta y responde "recovered"."""
+    (tmp_path / "missing").mkdir()
+    with make_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}").begin() as conn:
+        conn.execute(text("create table whoami (name text)"))
+        conn.execute(text("insert into whoami values ('recovered')"))
+
+
+def serve(router, times: int) -> list:
+    served = []
+    for _ in range(times):
+        db = router.session()
+        served.append(whoami(db))
+        db.close()
+    return served
+
+
+def test_round_robin_between_replicas(make_database):
+    router = ReadReplicaRouter([make_database("replica_a"), make_database("replica_b")], make_database("primary"))
+    assert serve(router, 4) == ["replica_a", "replica_b", "replica_a", "replica_b"]
+
+
+def test_failover_to_primary_when_replicas_are_down(make_database, down):
+    router = ReadReplicaRouter([down], make_database("primary"))
+    assert serve(router, 2) == ["primary", "primary"]
+
+
+def test_down_replica_is_skipped_until_retry(tmp_path, make_database, down):
+    router = ReadReplicaRouter([down, make_database("replica_a")], make_database("primary"), retry_seconds=60)
+    assert serve(router, 2) == ["replica_a", "replica_a"]
+    # Aunque ya responda, sigue fuera de la rotación hasta que venza el retry
+    recover(tmp_path)
+    assert serve(router, 4) == ["replica_a"] * 4
+
+
+def test_down_replica_returns_after_retry(tmp_path, make_database, down):
+    router = ReadReplicaRouter([down, make_database("replica_a")], make_database("primary"), retry_seconds=0)
+    assert serve(router, 2) == ["replica_a", "replica_a"]
+    recover(tmp_path)
+    assert sorted(serve(router, 4)) == ["recovered", "recovered", "replica_a", "replica_a"]
@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.singleflight import SingleFlight
+
+N = 8
+
+
+def wait_for_requests(flight: SingleFlight, n: int):
+    deadline = time.monotonic() + 5
+    while flight.stats()["requests"] < n:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+async def wait_for_requests_async(flight: SingleFlight, n: int):
+    deadline = time.monotonic() + 5
+    while flight.stats()["requests"] < n:
+        assert time.monotonic() < deadline
+        await asyncio.sleep(0.005)
+
+
+def run_threads(flight: SingleFlight, fn):
+    outcomes = [None] * N
+
+    def call(i):
+        try:
+            outcomes[i] = flight.do("key", fn)
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(N)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def test_sync_concurrent_calls_execute_once():
+    flight = SingleFlight()
+
+    def fn():
+        wait_for_requests(flight, N)
+        return object()
+
+    outcomes = run_threads(flight, fn)
+    assert flight.stats()["executions"] == 1
+    assert all(outcome is outcomes[0] for outcome in outcomes)
+
+
+def test_sync_error_propagates_to_followers():
+    flight = SingleFlight()
+
+    def fn():
+        wait_for_requests(flight, N)
+        raise ValueError("boom")
+
+    outcomes = run_threads(flight, fn)
+    assert flight.stats()["executions"] == 1
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_async_concurrent_calls_execute_once():
+    flight = SingleFlight()
+
+    async def fn():
+        await wait_for_requests_async(flight, N)
+        return object()
+
+    async def main():
+        return await asyncio.gather(*(flight.do_async("key", fn) for _ in range(N)))
+
+    outcomes = asyncio.run(main())
+    assert flight.stats()["executions"] == 1
+    assert all(outcome is outcomes[0] for outcome in outcomes)
+
+
+def test_async_error_propagates_to_followers():
+    flight = SingleFlight()
+
+    async def fn():
+        await wait_for_requests_async(flight, N)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(*(flight.do_async("key", fn) for _ in range(N)), return_exceptions=True)
+
+    outcomes = asyncio.run(main())
+    assert flight.stats()["executions"] == 1
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_async_follower_takes_over_when_the_leader_is_cancelled():
+    flight = SingleFlight()
+    started = []
+
+    async def fn():
+        started.append(None)
+        await wait_for_requests_async(flight, N)
+        await asyncio.sleep(10 if len(started) == 1 else 0.05)
+        return "ok"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do_async("key", fn))
+        followers = [asyncio.ensure_future(flight.do_async("key", fn)) for _ in range(N - 1)]
+        await wait_for_requests_async(flight, N)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*followers)
+
+    assert asyncio.run(main()) == ["ok"] * (N - 1)
+    assert flight.stats()["executions"] == 2
+    assert flight.stats()["in_flight"] == 0
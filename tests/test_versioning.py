@@ -0,0 +1,99 @@
+import threading
+
+import pandas as pd
+
+import app.main
+from app.analytics import HiringSnapshot, to_snapshot_frame
+
+REPORT = "/report/hirings"
+PARAMS = {"dimensions": "year", "measures": "hired", "limit": 1000}
+
+LATE_2030 = b"""70001,Future One,2030-05-01T10:00:00Z,1,1
+70002,Future Two,2030-06-01T10:00:00Z,2,2
+"""
+
+
+def hired_2030(response) -> int:
+    return sum(item["hired"] for item in response.json()["items"] if item["year"] == 2030)
+
+
+def upload(client, content: bytes):
+    response = client.post("/upload/hired_employees", files={"file": ("late.csv", content, "text/csv")})
+    assert response.status_code == 200
+    assert "error" not in response.json()
+
+
+def test_unchanged_report_is_not_modified(client):
+    first = client.get(REPORT, params=PARAMS)
+    assert first.status_code == 200
+    second = client.get(REPORT, params=PARAMS, headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 304
+    assert second.headers["ETag"] == first.headers["ETag"]
+
+
+def test_etag_never_labels_data_older_than_its_version(client, monkeypatch):
+    # El líder calcula el reporte y queda en pausa; mientras tanto se confirma una carga
+    queried, uploaded = threading.Event(), threading.Event()
+    run_report = app.main.run_report
+    calls = []
+
+    def slow_run_report(*args, **kwargs):
+        page = run_report(*args, **kwargs)
+        calls.append(None)
+        if len(calls) == 1:
+            queried.set()
+            assert uploaded.wait(10)
+        return page
+
+    monkeypatch.setattr(app.main, "run_report", slow_run_report)
+    responses = {}
+
+    def get(name):
+        responses[name] = client.get(REPORT, params=PARAMS)
+
+    leader = threading.Thread(target=get, args=("leader",))
+    leader.start()
+    assert queried.wait(10)
+
+    upload(client, LATE_2030)
+
+    # Llega después de la carga: no puede unirse al flight del líder, que ya leyó datos viejos
+    follower = threading.Thread(target=get, args=("follower",))
+    follower.start()
+    follower.join(1)
+    uploaded.set()
+    leader.join(10)
+    follower.join(10)
+
+    assert hired_2030(responses["leader"]) == 0
+    assert hired_2030(responses["follower"]) == 2
+    assert responses["leader"].headers["ETag"] != responses["follower"].headers["ETag"]
+
+    # Con el ETag del líder (datos viejos) no hay 304; con el del seguidor sí
+    stale = client.get(REPORT, params=PARAMS, headers={"If-None-Match": responses["leader"].headers["ETag"]})
+    assert stale.status_code == 200
+    assert hired_2030(stale) == 2
+    fresh = client.get(REPORT, params=PARAMS, headers={"If-None-Match": responses["follower"].headers["ETag"]})
+    assert fresh.status_code == 304
+
+
+def test_snapshot_serves_only_its_own_version():
+    rows = pd.DataFrame({
+        "id": [1, 2],
+        "datetime": pd.to_datetime(["2021-01-01", "2021-05-01"]),
+        "department_id": [1, 1],
+        "job_id": [1, 1],
+    })
+    snapshot = HiringSnapshot(enabled=True, max_age=float("inf"))
+    snapshot.replace(to_snapshot_frame(rows), {1: "Sales"}, {1: "Engineer"}, data_version=3)
+    assert snapshot.is_fresh(3)
+    assert not snapshot.is_fresh(4)
+
+    # Ingesta propia consecutiva: el snapshot pasa a la nueva versión
+    snapshot.apply_ingest("hired_employees", rows.assign(id=[3, 4]), data_version=4)
+    assert snapshot.is_fresh(4)
+
+    # Hubo una escritura de otro worker (versión 5) que este snapshot no vio
+    snapshot.apply_ingest("hired_employees", rows.assign(id=[5, 6]), data_version=6)
+    assert not snapshot.is_fresh(6)
+    assert snapshot.is_fresh(4)